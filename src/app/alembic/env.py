@@ -26,11 +26,18 @@ target_metadata = None
 # my_important_option = config.get_main_option("my_important_option")
 # ... etc.
 
+# Параметры для запуска из скриптов, например из benchmarks.repo_queries:
+# alembic -x url=postgresql+asyncpg://... -x schema=name upgrade head
+x_args = context.get_x_argument(as_dictionary=True)
+
 section = config.config_ini_section
-config.set_section_option(section, "DB_USER", os.getenv("PG_USER"))
-config.set_section_option(section, "DB_PASS", os.getenv("PG_PASSWORD"))
-config.set_section_option(section, "DB_NAME", os.getenv("PG_DB"))
-config.set_section_option(section, "DB_HOST", os.getenv("PG_HOST"))
+if "url" in x_args:
+    config.set_main_option("sqlalchemy.url", x_args["url"].replace("%", "%%"))
+else:
+    config.set_section_option(section, "DB_USER", os.getenv("PG_USER"))
+    config.set_section_option(section, "DB_PASS", os.getenv("PG_PASSWORD"))
+    config.set_section_option(section, "DB_NAME", os.getenv("PG_DB"))
+    config.set_section_option(section, "DB_HOST", os.getenv("PG_HOST"))
 
 
 def run_migrations_offline():
@@ -78,6 +85,8 @@ async def run_migrations_online():
             prefix="sqlalchemy.",
             poolclass=pool.NullPool,
             future=True,
+            # Таблицы и версия миграций создаются в указанной схеме
+            connect_args={"server_settings": {"search_path": x_args["schema"]}} if "schema" in x_args else {},
         )
     )
     async with connectable.connect() as connection:
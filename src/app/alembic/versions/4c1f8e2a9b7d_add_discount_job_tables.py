@@ -0,0 +1,44 @@
+"""add_discount_job_tables
+
+Revision ID: 4c1f8e2a9b7d
+Revises: bbe6561db2a9
+Create Date: 2026-10-18 12:10:41.318214
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import func
+
+# revision identifiers, used by Alembic.
+revision = '4c1f8e2a9b7d'
+down_revision = 'bbe6561db2a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'discount_job_partitions',
+        sa.Column('run_date', sa.DATE, primary_key=True),
+        sa.Column('store_id', sa.VARCHAR(10), primary_key=True),
+        sa.Column('status', sa.VARCHAR(16), nullable=False, server_default='pending'),
+        sa.Column('lease_owner', sa.VARCHAR(100)),
+        sa.Column('lease_expires_at', sa.TIMESTAMP),
+        sa.Column('attempts', sa.INTEGER, nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.TIMESTAMP, server_default=func.now()),
+    )
+    op.create_index('discount_job_partitions_status_idx', 'discount_job_partitions', ['run_date', 'status'])
+
+    op.create_table(
+        'discount_job_deliveries',
+        sa.Column('run_date', sa.DATE, primary_key=True),
+        sa.Column('user_id', sa.BIGINT, primary_key=True),
+        sa.Column('status', sa.VARCHAR(16), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP, server_default=func.now()),
+    )
+
+
+def downgrade():
+    op.drop_table('discount_job_deliveries')
+    op.drop_index('discount_job_partitions_status_idx', 'discount_job_partitions')
+    op.drop_table('discount_job_partitions')
@@ -0,0 +1,31 @@
+"""add_user_skus_and_store_indexes
+
+Revision ID: 5d8e1f3a7c69
+Revises: 9a2b6c4d1e35
+Create Date: 2026-10-18 16:05:32.640178
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '5d8e1f3a7c69'
+down_revision = '9a2b6c4d1e35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Индексы строятся без блокировки записи, поэтому вне транзакции миграции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'user_skus_sku_id_idx', 'user_skus', ['sku_id'], postgresql_concurrently=True,
+        )
+        op.create_index(
+            'user_store_store_id_idx', 'user_store', ['store_id', 'user_id'], postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('user_store_store_id_idx', 'user_store', postgresql_concurrently=True)
+        op.drop_index('user_skus_sku_id_idx', 'user_skus', postgresql_concurrently=True)
@@ -0,0 +1,33 @@
+"""add_store_sku_snapshots
+
+Revision ID: 7e3d5b1c8f42
+Revises: 4c1f8e2a9b7d
+Create Date: 2026-10-18 14:02:17.904521
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy import func
+
+# revision identifiers, used by Alembic.
+revision = '7e3d5b1c8f42'
+down_revision = '4c1f8e2a9b7d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'store_sku_snapshots',
+        sa.Column('store_id', sa.VARCHAR(10), primary_key=True),
+        sa.Column('sku_id', sa.VARCHAR(10), primary_key=True),
+        sa.Column('promo_id', sa.VARCHAR(50)),
+        sa.Column('regular_price', sa.FLOAT),
+        sa.Column('discount_price', sa.FLOAT),
+        sa.Column('validity_end_date', sa.DATE),
+        sa.Column('updated_at', sa.TIMESTAMP, server_default=func.now()),
+    )
+
+
+def downgrade():
+    op.drop_table('store_sku_snapshots')
@@ -0,0 +1,41 @@
+"""add_sku_price_history
+
+Revision ID: 9a2b6c4d1e35
+Revises: 7e3d5b1c8f42
+Create Date: 2026-10-18 15:21:48.117364
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '9a2b6c4d1e35'
+down_revision = '7e3d5b1c8f42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'sku_price_history',
+        sa.Column('store_id', sa.VARCHAR(10), nullable=False),
+        sa.Column('sku_id', sa.VARCHAR(10), nullable=False),
+        sa.Column('observed_at', sa.TIMESTAMP, nullable=False),
+        sa.Column('regular_price', sa.FLOAT, nullable=False),
+        sa.Column('discount_price', sa.FLOAT),
+        sa.Column('promo_id', sa.VARCHAR(50)),
+    )
+    # Запросы истории идут по одному товару магазина за период
+    op.create_index(
+        'sku_price_history_sku_idx', 'sku_price_history', ['store_id', 'sku_id', 'observed_at'],
+    )
+    # Строки добавляются в порядке времени, BRIN индекс для очистки старой истории почти ничего не занимает
+    op.create_index(
+        'sku_price_history_observed_at_idx', 'sku_price_history', ['observed_at'], postgresql_using='brin',
+    )
+
+
+def downgrade():
+    op.drop_index('sku_price_history_observed_at_idx', 'sku_price_history')
+    op.drop_index('sku_price_history_sku_idx', 'sku_price_history')
+    op.drop_table('sku_price_history')
@@ -1,30 +1,93 @@
 import json
+import random
 from datetime import datetime
+from typing import Optional
 
-from aioinflux import InfluxDBClient, InfluxDBWriteError
+from aioinflux import InfluxDBClient
 
 from analytics.objects import BotUpdate
+from analytics.writer import BufferedWriter, DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL, DEFAULT_MAX_BUFFER
+
+
+class PayloadMode:
+    FULL = "full"  # Сохраняется весь update
+    PROJECTION = "projection"  # Сохраняются только выбранные поля, update сохраняется для части событий
 
 
 class AnaliyticsClient:
 
-    def __init__(self, influx_host: str, influx_user: str, influx_password: str, influx_db: str):
-        """Инициализация клиента для работы с InfluxDB"""
+    def __init__(
+            self,
+            influx_host: str,
+            influx_user: str,
+            influx_password: str,
+            influx_db: str,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+            max_buffer: int = DEFAULT_MAX_BUFFER,
+            payload_mode: str = PayloadMode.PROJECTION,
+            payload_sample_rate: float = 0.0,
+    ):
+        """
+        Инициализация клиента для работы с InfluxDB
+        :param batch_size: Кол-во записей, отправляемых за раз
+        :param flush_interval: Период отправки записей в секундах
+        :param max_buffer: Максимальное кол-во неотправленных записей
+        :param payload_mode: Режим сохранения update
+        :param payload_sample_rate: Доля событий, для которых update сохраняется целиком в режиме projection
+        """
+        if payload_mode not in (PayloadMode.FULL, PayloadMode.PROJECTION):
+            raise ValueError(f"Unknown analytics payload mode: {payload_mode}")
+
         self.client = InfluxDBClient(
             host=influx_host,
             username=influx_user,
             password=influx_password,
             database=influx_db,
         )
+        self.writer = BufferedWriter(self.client, batch_size, flush_interval, max_buffer)
+        self._payload_mode = payload_mode
+        self._payload_sample_rate = payload_sample_rate
 
-    async def log(self, update_type: str, value: str, event_datetime: datetime, update: dict, user_id: int):
+    def start(self) -> None:
+        """Запуск фоновой отправки записей"""
+        self.writer.start()
+
+    async def close(self) -> None:
+        """Отправка оставшихся записей и закрытие соединения"""
+        await self.writer.close()
+        await self.client.close()
+
+    def wants_payload(self) -> bool:
+        """Нужно ли сохранять update целиком для текущего события"""
+        if self._payload_mode == PayloadMode.FULL:
+            return True
+        return self._payload_sample_rate > 0 and random.random() < self._payload_sample_rate
+
+    def log(
+            self,
+            update_type: str,
+            value: str,
+            event_datetime: datetime,
+            user_id: int,
+            chat_id: Optional[int] = None,
+            handler: Optional[str] = None,
+            callback_prefix: Optional[str] = None,
+            latency: Optional[float] = None,
+            update: Optional[dict] = None,
+    ):
         """
-        Сохранение записи в InfluxDB
+        Добавление записи в очередь на сохранение в InfluxDB
 
         :param update_type: Тип update
         :param value: Тип события
         :param event_datetime: Время события
-        :param update: Объект update
+        :param user_id: Идентификатор пользователя
+        :param chat_id: Идентификатор чата
+        :param handler: Название обработчика
+        :param callback_prefix: Префикс данных нажатой кнопки
+        :param latency: Время обработки в секундах
+        :param update: Объект update, сохраняется, если передан
         :return:
         """
 
@@ -33,12 +96,12 @@ class AnaliyticsClient:
             value=value,
             timestamp=event_datetime,
             update_type=update_type,
-            update=json.dumps(update),
+            handler=handler,
+            callback_prefix=callback_prefix,
+            chat_id=chat_id,
+            latency_ms=round(latency * 1000, 3) if latency is not None else None,
+            update=json.dumps(update) if update is not None else None,
             stub=1,
             user_id=str(user_id),
         )
-
-        try:
-            await self.client.write(update)
-        except InfluxDBWriteError as ex:
-            print(ex)
+        self.writer.put(update)
@@ -1,14 +1,18 @@
-from typing import NamedTuple
+from typing import NamedTuple, Optional
 
-from aioinflux import lineprotocol, MEASUREMENT, STR, TIMEDT, INT, TAG
+from aioinflux import lineprotocol, MEASUREMENT, STR, TIMEDT, INT, TAG, FLOAT
 
 
-@lineprotocol
+@lineprotocol(rm_none=True)
 class BotUpdate(NamedTuple):
     measurement: MEASUREMENT
     timestamp: TIMEDT
     update_type: TAG
     user_id: TAG
     value: TAG
-    update: STR
+    handler: TAG
+    callback_prefix: TAG
+    chat_id: Optional[INT]
+    latency_ms: Optional[FLOAT]
+    update: Optional[STR]
     stub: INT
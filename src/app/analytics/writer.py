@@ -0,0 +1,130 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Optional
+
+from aioinflux import InfluxDBClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500  # Кол-во точек, при котором запись выполняется сразу
+DEFAULT_FLUSH_INTERVAL = 5.0  # Период записи накопленных точек в секундах
+DEFAULT_MAX_BUFFER = 10000  # Максимальное кол-во точек в памяти
+
+
+class WriterStats:
+    """Статистика записи точек"""
+
+    def __init__(self):
+        self.written = 0
+        self.dropped = 0  # Вытеснены из заполненного буфера
+        self.failed = 0  # Не записаны из-за ошибки InfluxDB
+
+    def __str__(self):
+        return f"written={self.written} dropped={self.dropped} failed={self.failed}"
+
+
+class BufferedWriter:
+    """
+    Запись точек в InfluxDB пачками в фоне
+    Добавление точки не ожидает записи. При заполнении буфера
+    вытесняются самые старые точки, а не блокируется обработка обновлений
+    """
+
+    def __init__(
+            self,
+            client: InfluxDBClient,
+            batch_size: int = DEFAULT_BATCH_SIZE,
+            flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+            max_buffer: int = DEFAULT_MAX_BUFFER,
+    ):
+        """
+        :param client: Клиент InfluxDB
+        :param batch_size: Кол-во точек в одной записи
+        :param flush_interval: Период записи в секундах
+        :param max_buffer: Максимальное кол-во точек в памяти
+        """
+        self._client = client
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._buffer: deque = deque(maxlen=max_buffer)
+        self._batch_ready = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self.stats = WriterStats()
+
+    def put(self, point: Any) -> None:
+        """Добавление точки в буфер"""
+        if len(self._buffer) == self._buffer.maxlen:
+            self.stats.dropped += 1
+        self._buffer.append(point)
+        if len(self._buffer) >= self._batch_size:
+            self._batch_ready.set()
+
+    def start(self) -> None:
+        """Запуск фоновой записи"""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        """
+        Остановка фоновой записи и запись оставшихся точек
+        Фоновая запись не отменяется, а завершается после текущей пачки.
+        Точки, которые не удалось записать, учитываются как незаписанные
+        """
+        if self._flusher is not None:
+            self._stopping.set()
+            self._batch_ready.set()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self._flush_all()
+        if self._buffer:
+            self.stats.failed += len(self._buffer)
+            logger.error("Dropped %s points not written to InfluxDB on close", len(self._buffer))
+            self._buffer.clear()
+
+    async def flush(self) -> bool:
+        """
+        Запись одной пачки точек
+        :return: Успешность записи
+        """
+        async with self._flush_lock:
+            batch = [self._buffer.popleft() for _ in range(min(self._batch_size, len(self._buffer)))]
+            if not batch:
+                return True
+            try:
+                await self._client.write(batch)
+            except asyncio.CancelledError:
+                self._return_batch(batch)
+                raise
+            except Exception as e:
+                self.stats.failed += len(batch)
+                logger.error("Failed to write %s points to InfluxDB: %r", len(batch), e)
+                return False
+            self.stats.written += len(batch)
+            return True
+
+    def _return_batch(self, batch: list) -> None:
+        """Возврат незаписанной пачки в начало буфера, не поместившиеся точки учитываются как вытесненные"""
+        overflow = len(self._buffer) + len(batch) - self._buffer.maxlen
+        if overflow > 0:
+            # extendleft заполненного буфера вытесняет самые новые точки
+            self.stats.dropped += overflow
+        self._buffer.extendleft(reversed(batch))
+
+    async def _flush_all(self) -> None:
+        """Запись всех накопленных точек до первой ошибки"""
+        while self._buffer:
+            if not await self.flush():
+                break
+
+    async def _flush_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            # После паузы записываем всё накопленное, не дожидаясь следующего периода
+            await self._flush_all()
@@ -0,0 +1,65 @@
+"""
+Сравнение размера и скорости сериализации записей кэша разными кодеками
+
+Для замера на реальных данных сохраните ответы API в JSON файлы и передайте их:
+    python -m benchmarks.cache_codecs payloads/catalog.json payloads/search.json
+Без файлов используется синтетический каталог из benchmarks.object_cache.
+Кодеки, для которых не установлены библиотеки, пропускаются
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from benchmarks.object_cache import build_catalog
+from lenta.cache.codecs import CODECS, COMPRESSIONS, CacheSerializer, CodecError
+
+
+def load_payloads(paths: list[str]) -> dict[str, object]:
+    if not paths:
+        return {"synthetic catalog": build_catalog(20, 15, 10)}
+    return {Path(path).name: json.loads(Path(path).read_text(encoding="utf-8")) for path in paths}
+
+
+def measure(serializer: CacheSerializer, payload: object, iterations: int) -> tuple[int, float, float]:
+    """
+    Замер сериализации значения
+    :return: Размер записи в байтах, время записи и чтения в микросекундах
+    """
+    record = serializer.dumps(payload)
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        serializer.dumps(payload)
+    encode_time = (time.perf_counter() - started_at) / iterations * 1_000_000
+
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        serializer.loads(record)
+    decode_time = (time.perf_counter() - started_at) / iterations * 1_000_000
+    return len(record), encode_time, decode_time
+
+
+def main(args: argparse.Namespace) -> None:
+    for name, payload in load_payloads(args.payloads).items():
+        baseline = len(json.dumps({"value": payload, "expires_at": 0.0}).encode())
+        print(f"\n== {name}: stdlib json {baseline} bytes")
+        print(f"{'codec':<10}{'compression':<13}{'bytes':>10}{'ratio':>8}{'encode, us':>13}{'decode, us':>13}")
+        for codec in CODECS:
+            for compression in COMPRESSIONS:
+                try:
+                    serializer = CacheSerializer(codec, compression, args.threshold)
+                except CodecError:
+                    continue
+                size, encode_time, decode_time = measure(
+                    serializer, {"value": payload, "expires_at": 0.0}, args.iterations,
+                )
+                print(f"{codec:<10}{compression:<13}{size:>10}{size / baseline:>8.2f}"
+                      f"{encode_time:>13.1f}{decode_time:>13.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("payloads", nargs="*", help="JSON файлы с ответами API")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--threshold", type=int, default=1024)
+    main(parser.parse_args())
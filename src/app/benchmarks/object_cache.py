@@ -0,0 +1,91 @@
+"""
+Сравнение стоимости получения каталога с кэшем разобранных моделей и без него
+
+Запуск из каталога app:
+    python -m benchmarks.object_cache --groups 20 --categories 15 --subcategories 10
+"""
+import argparse
+import asyncio
+import time
+from typing import Optional, Union
+
+from lenta.cache.memory import MemoryCache
+from lenta.client import LentaClient
+
+IMAGE = {
+    "thumbnail": "https://lenta.com/images/thumbnail.png",
+    "medium": "https://lenta.com/images/medium.png",
+    "fullSize": "https://lenta.com/images/full.png",
+    "mediumLossy": "https://lenta.com/images/lossy.png",
+}
+
+
+def _category(code: str, **children) -> dict:
+    return {
+        "code": code,
+        "name": f"Категория {code}",
+        "skuCount": 100,
+        "skuDiscountCount": 10,
+        "showLentochkaBanner": False,
+        "image": IMAGE,
+        "url": f"/catalog/{code}/",
+        **children,
+    }
+
+
+def build_catalog(groups: int, categories: int, subcategories: int) -> dict:
+    """Формирование каталога заданного размера в формате ответа API"""
+    return {
+        "catalogGroups": [
+            _category(f"g{g}", categories=[
+                _category(f"g{g}c{c}", subcategories=[
+                    _category(f"g{g}c{c}s{s}") for s in range(subcategories)
+                ])
+                for c in range(categories)
+            ])
+            for g in range(groups)
+        ],
+        "lentochkaPromotion": {"banner": None, "bannerUrl": None},
+    }
+
+
+class StaticApiService:
+    """Замена ApiService, возвращающая заранее подготовленный ответ, как при попадании в кэш"""
+
+    def __init__(self, response: Union[dict, list]):
+        self._response = response
+
+    async def api_request(self, http_method: str, api_method: str, params: Optional[dict] = None,
+                          json: Optional[dict] = None, cache_time: int = 0) -> Union[dict, list]:
+        return self._response
+
+
+async def measure(client: LentaClient, iterations: int) -> float:
+    """Среднее время вызова get_catalog в микросекундах"""
+    await client.get_catalog("0001")  # Прогрев кэша
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        await client.get_catalog("0001")
+    return (time.perf_counter() - started_at) / iterations * 1_000_000
+
+
+async def main(args: argparse.Namespace) -> None:
+    api_service = StaticApiService(build_catalog(args.groups, args.categories, args.subcategories))
+    without_cache = LentaClient(api_service=api_service)
+    with_cache = LentaClient(api_service=api_service, object_cache=MemoryCache())
+
+    before = await measure(without_cache, args.iterations)
+    after = await measure(with_cache, args.iterations)
+    print(f"Catalog size: {args.groups * args.categories * args.subcategories} subcategories")
+    print(f"get_catalog without object cache: {before:.1f} us/call")
+    print(f"get_catalog with object cache:    {after:.1f} us/call")
+    print(f"Speedup: {before / after:.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--groups", type=int, default=20)
+    parser.add_argument("--categories", type=int, default=15)
+    parser.add_argument("--subcategories", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -10,10 +10,13 @@ from aiogram.types import BotCommand, ParseMode
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from analytics.client import AnaliyticsClient
+from lenta.cache.base import BaseCache
+from lenta.cache.codecs import CacheSerializer
 from lenta.cache.memory import MemoryCache
 from lenta.cache.redis import RedisCache
+from lenta.cache.tiered import TieredCache
 from lenta.client import LentaClient
-from tgbot.config import load_config, COMMANDS
+from tgbot.config import Config, load_config, COMMANDS
 from tgbot.handlers.profile import register_profile
 from tgbot.handlers.sku import register_sku
 from tgbot.handlers.store import register_store
@@ -21,13 +24,30 @@ from tgbot.handlers.user import register_user
 from tgbot.middlewares.db import DbMiddleware
 from tgbot.middlewares.lenta import LentaMiddleware
 from tgbot.middlewares.logger import LoggerMiddleware
-from tgbot.services.lenta import get_discounts_for_skus
+from tgbot.services.jobs import DiscountJobRunner
+from tgbot.services.limiter import TokenBucket
+from tgbot.services.pool import MeteredPool, PoolMetrics
+from tgbot.services.price_history import PriceHistoryWriter
+from tgbot.services.user_cache import UserCache
 
 logger = logging.getLogger(__name__)
 
 
-def create_pool(connection_string: str, echo: bool) -> asyncpg.Pool:
-    return asyncpg.create_pool(connection_string)
+def create_pool(config: Config) -> asyncpg.Pool:
+    return asyncpg.create_pool(
+        config.PG_CONNECTION_STRING,
+        min_size=config.PG_POOL_MIN_SIZE,
+        max_size=config.PG_POOL_MAX_SIZE,
+        statement_cache_size=config.PG_STATEMENT_CACHE_SIZE,
+        max_cached_statement_lifetime=config.PG_MAX_CACHED_STATEMENT_LIFETIME,
+        max_inactive_connection_lifetime=config.PG_MAX_INACTIVE_CONNECTION_LIFETIME,
+    )
+
+
+def log_stats(cache: BaseCache, pool: MeteredPool, analytics: AnaliyticsClient) -> None:
+    logger.info("Lenta cache stats: %s", cache.stats)
+    logger.info("Postgres pool stats: %s", pool.metrics)
+    logger.info("Analytics writer stats: %s", analytics.writer.stats)
 
 
 def register_handlers(dp: Dispatcher) -> None:
@@ -45,17 +65,44 @@ async def main():
     logger.info("Starting bot")
     config = load_config()
 
+    user_cache_storage: BaseCache = MemoryCache(max_entries=config.USER_CACHE_MAX_ENTRIES)
     if config.TG_USE_REDIS:
         storage = RedisStorage(host=config.REDIS_HOST)
-        cache = RedisCache(host=config.REDIS_HOST)
+        serializer = CacheSerializer(
+            codec=config.LENTA_CACHE_CODEC,
+            compression=config.LENTA_CACHE_COMPRESSION,
+            compress_threshold=config.LENTA_CACHE_COMPRESS_THRESHOLD,
+        )
+        cache = RedisCache(
+            host=config.REDIS_HOST, stale_ratio=config.LENTA_CACHE_STALE_RATIO, serializer=serializer,
+        )
+        if config.LENTA_CACHE_L1_TTL:
+            # Горячие ответы читаются из памяти процесса, а не из Redis
+            cache = TieredCache(
+                MemoryCache(max_entries=config.LENTA_CACHE_L1_MAX_ENTRIES),
+                cache,
+                l1_ttl=config.LENTA_CACHE_L1_TTL,
+            )
+        # Данные пользователей изменяются через любой экземпляр бота,
+        # поэтому остальные узнают об изменениях через pub/sub
+        user_cache_storage = TieredCache(
+            user_cache_storage,
+            RedisCache(host=config.REDIS_HOST, prefix_key="user_cache", serializer=serializer),
+            l1_ttl=config.USER_CACHE_L1_TTL,
+            channel="user_cache:invalidate",
+        )
     else:
         storage = MemoryStorage()
-        cache = MemoryCache()
+        cache = MemoryCache(
+            stale_ratio=config.LENTA_CACHE_STALE_RATIO,
+            max_entries=config.LENTA_CACHE_MAX_ENTRIES,
+            max_bytes=config.LENTA_CACHE_MAX_BYTES,
+            policy=config.LENTA_CACHE_POLICY,
+        )
 
-    pool: asyncpg.Pool = await create_pool(
-        config.PG_CONNECTION_STRING,
-        echo=False,
-    )
+    # Все соединения берутся через пул со статистикой, в том числе фоновыми задачами
+    pool = MeteredPool(await create_pool(config), PoolMetrics(config.PG_POOL_MAX_SIZE))
+    user_cache = UserCache(user_cache_storage, ttl=config.USER_CACHE_TTL)
 
     bot = Bot(token=config.TG_TOKEN, parse_mode=ParseMode.MARKDOWN_V2)
     dp = Dispatcher(bot, storage=storage)
@@ -64,13 +111,40 @@ async def main():
         config.INFLUXDB_USER,
         config.INFLUXDB_USER_PASSWORD,
         config.INFLUXDB_DB,
+        batch_size=config.INFLUXDB_BATCH_SIZE,
+        flush_interval=config.INFLUXDB_FLUSH_INTERVAL,
+        max_buffer=config.INFLUXDB_MAX_BUFFER,
+        payload_mode=config.ANALYTICS_PAYLOAD_MODE,
+        payload_sample_rate=config.ANALYTICS_PAYLOAD_SAMPLE_RATE,
+    )
+    price_history = PriceHistoryWriter(pool, flush_interval=config.PRICE_HISTORY_FLUSH_INTERVAL)
+    lenta_client = LentaClient(
+        cache_storage=cache,
+        skus_chunk_size=config.LENTA_SKUS_CHUNK_SIZE,
+        object_cache=MemoryCache(max_entries=config.LENTA_OBJECT_CACHE_MAX_ENTRIES),
+        sku_observer=price_history.observe,
+        # Все запросы идут на один хост API, поэтому ограничитель общий
+        request_limiter=TokenBucket(config.LENTA_RATE_LIMIT).acquire,
+        skus_chunk_concurrency=config.LENTA_SKUS_CHUNK_CONCURRENCY,
     )
-    lenta_client = LentaClient(cache_storage=cache)
     scheduler = AsyncIOScheduler()
+    discount_job = DiscountJobRunner(
+        pool,
+        lenta_client,
+        bot,
+        worker_id=config.BOT_INSTANCE_ID,
+        max_concurrency=config.LENTA_MAX_CONCURRENCY,
+        store_timeout=config.LENTA_STORE_TIMEOUT,
+        broadcast_workers=config.TG_BROADCAST_WORKERS,
+        broadcast_rate=config.TG_BROADCAST_RATE,
+        lease_seconds=config.DISCOUNT_JOB_LEASE_SECONDS,
+    )
 
     register_handlers(dp)
 
-    dp.middleware.setup(DbMiddleware(pool))
+    dp.middleware.setup(DbMiddleware(
+        pool, lazy=config.PG_LAZY_CONNECTIONS, user_cache=user_cache,
+    ))
     dp.middleware.setup(LentaMiddleware(lenta_client))
     dp.middleware.setup(LoggerMiddleware(analitycs))
 
@@ -79,12 +153,22 @@ async def main():
     try:
         logging.info(datetime.datetime.now())
         scheduler.start()
-        scheduler.add_job(get_discounts_for_skus, "cron", minute=0, hour=0, second=0, args=(pool, lenta_client, bot))
+        price_history.start()
+        analitycs.start()
+        scheduler.add_job(discount_job.run, "cron", minute=0, hour=0, second=0)
+        # Продолжение рассылки, прерванной перезапуском
+        scheduler.add_job(discount_job.resume)
+        scheduler.add_job(log_stats, "interval", minutes=10, args=(cache, pool, analitycs))
         await dp.start_polling()
     finally:
+        await discount_job.close()
         await dp.storage.close()
         await dp.storage.wait_closed()
         await cache.close()
+        await user_cache.cache.close()
+        await price_history.close()
+        await analitycs.close()
+        await pool.close()
         await bot.session.close()
 
 
@@ -1,15 +1,20 @@
+import asyncio
 import json as json_
+import time
 from http import HTTPStatus
 from typing import Optional, Union
 
 import aiohttp
 
-from lenta.cache.base import BaseCache, create_key_by_args
+from lenta.cache.base import BaseCache, CacheEntry, create_key_by_args
+from lenta.consts import MINUTE
 from lenta.exeptions import LentaRequestError
 
 LENTA_BASE_URL = "https://lenta.com"
 FAKE_USER_AGENT = "Mozilla/5.0 (iPhone; CPU iPhone OS 12_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) " \
                   "CriOS/69.0.3497.105 Mobile/15E148 Safari/605.1"
+NOT_FOUND_CACHE_TIME = MINUTE * 5  # Время жизни в кэше ответа об отсутствии объекта
+NOT_FOUND_KEY = "__not_found__"  # Ключ значения кэша, которым отмечается отсутствующий объект
 
 
 class ApiServer:
@@ -40,7 +45,14 @@ class ApiService:
 
     def __init__(self, server: Optional[ApiServer] = None,
                  session: Optional[aiohttp.ClientSession] = None,
-                 cache: Optional[BaseCache] = None):
+                 cache: Optional[BaseCache] = None,
+                 not_found_cache_time: int = NOT_FOUND_CACHE_TIME):
+        """
+        :param server: Сервер API
+        :param session: HTTP сессия
+        :param cache: Кэш ответов
+        :param not_found_cache_time: Время жизни в кэше ответа 404, не больше времени кэширования запроса
+        """
         if session is None:
             session = aiohttp.ClientSession(
                 headers={
@@ -54,6 +66,9 @@ class ApiService:
         self._server = server
         self._session = session
         self._cache = cache
+        self._not_found_cache_time = not_found_cache_time
+        # Выполняющиеся запросы по ключу кэша, одинаковые запросы ожидают общий результат
+        self._in_flight: dict[str, asyncio.Task] = {}
 
     async def api_request(
             self,
@@ -63,13 +78,28 @@ class ApiService:
             json: Optional[dict] = None,
             cache_time: int = 0,
     ):
+        entry = await self.api_request_entry(http_method, api_method, params, json, cache_time)
+        return entry.value
+
+    async def api_request_entry(
+            self,
+            http_method: str,
+            api_method: str,
+            params: Optional[dict] = None,
+            json: Optional[dict] = None,
+            cache_time: int = 0,
+    ) -> CacheEntry:
+        """
+        Выполнение запроса с получением ответа вместе со временем его устаревания
+        Позволяет не хранить производные от ответа данные дольше самого ответа
+        """
         if params is None:
             params = {}
         if json is None:
             json = {}
 
         url = self._server.api_url(api_method)
-        return await self.raw_request(
+        return await self.raw_request_entry(
             url,
             http_method,
             params,
@@ -85,11 +115,67 @@ class ApiService:
             json: dict,
             cache_time: int,
     ) -> Union[list, dict]:
+        entry = await self.raw_request_entry(url, method, params, json, cache_time)
+        return entry.value
+
+    async def raw_request_entry(
+            self,
+            url: str,
+            method: str,
+            params: dict,
+            json: dict,
+            cache_time: int,
+    ) -> CacheEntry:
 
         cache_key = create_key_by_args(url, method, **params, **json)
-        response_from_cache = await self._cache.get(cache_key)
-        if response_from_cache:
-            return response_from_cache
+        # Некэшируемые ответы в кэш не попадают, поэтому не обращаемся к нему
+        cache_entry = await self._cache.get_entry(cache_key) if cache_time else None
+        if cache_entry is not None:
+            if cache_entry.is_stale:
+                # Отдаём устаревшее значение сразу, а обновляем его в фоне
+                self._get_request_task(cache_key, url, method, params, json, cache_time)
+            return cache_entry._replace(value=self._unwrap_cached(cache_entry.value))
+
+        task = self._get_request_task(cache_key, url, method, params, json, cache_time)
+        # Отмена одного из ожидающих не должна отменять общий запрос
+        response_json = await asyncio.shield(task)
+        return CacheEntry(response_json, time.time() + cache_time)
+
+    def _get_request_task(
+            self,
+            cache_key: str,
+            url: str,
+            method: str,
+            params: dict,
+            json: dict,
+            cache_time: int,
+    ) -> asyncio.Task:
+        """Получение выполняющегося запроса по ключу кэша или запуск нового"""
+        task = self._in_flight.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(self._request_and_cache(cache_key, url, method, params, json, cache_time))
+            self._in_flight[cache_key] = task
+            task.add_done_callback(lambda t: self._complete_in_flight(cache_key, t))
+        return task
+
+    def _complete_in_flight(self, cache_key: str, task: asyncio.Task) -> None:
+        """Удаление завершённого запроса из списка выполняющихся"""
+        if self._in_flight.get(cache_key) is task:
+            del self._in_flight[cache_key]
+        if not task.cancelled():
+            # Помечаем исключение обработанным, если его никто не ожидал
+            task.exception()
+
+    async def _request_and_cache(
+            self,
+            cache_key: str,
+            url: str,
+            method: str,
+            params: dict,
+            json: dict,
+            cache_time: int,
+    ) -> Union[list, dict]:
+        """Выполнение запроса к API и сохранение ответа в кэш"""
         response = await self._session.request(
             method,
             url,
@@ -97,13 +183,33 @@ class ApiService:
             params=params,
         )
 
-        response_json = self.check_result(response, await response.text())
+        try:
+            response_json = self.check_result(response, await response.text())
+        except LentaRequestError as e:
+            # Запоминаем отсутствие объекта, чтобы повторные запросы, например
+            # с неизвестным штрих-кодом, не уходили в API
+            if cache_time and e.error_code == HTTPStatus.NOT_FOUND:
+                not_found = {NOT_FOUND_KEY: {"message": e.message, "url": e.url}}
+                await self._cache.set(cache_key, not_found, min(cache_time, self._not_found_cache_time))
+            raise
 
         if cache_time:
             await self._cache.set(cache_key, response_json, cache_time)
 
         return response_json
 
+    @classmethod
+    def _unwrap_cached(cls, value: Union[list, dict]) -> Union[list, dict]:
+        """Получение ответа из значения кэша, для отсутствующего объекта выбрасывается ошибка"""
+        if isinstance(value, dict) and NOT_FOUND_KEY in value:
+            not_found = value[NOT_FOUND_KEY]
+            raise LentaRequestError(
+                url=not_found["url"],
+                message=not_found["message"],
+                error_code=HTTPStatus.NOT_FOUND,
+            )
+        return value
+
     @classmethod
     def check_result(cls, response: aiohttp.ClientResponse, body: str) -> dict:
         status_code = response.status
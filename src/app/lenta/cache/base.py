@@ -1,10 +1,78 @@
+import hashlib
+import json
+import time
 import typing
 from abc import ABC, abstractmethod
 
+KEY_SCHEMA_VERSION = 2  # Версия формата ключей, при её изменении старые записи перестают читаться
+MAX_KEY_LENGTH = 200  # Более длинные ключи заменяются хэшем
+KEY_READABLE_LENGTH = 100  # Длина начала ключа, сохраняемого перед хэшем для отладки
+
+
+class CacheEntry(typing.NamedTuple):
+    """Запись кэша"""
+    value: typing.Union[dict, list]
+    expires_at: float  # Время устаревания записи, после него запись отдаётся до окончательного удаления
+
+    @property
+    def is_stale(self) -> bool:
+        return self.expires_at < time.time()
+
+
+class CacheStats:
+    """Статистика обращений к кэшу"""
+
+    def __init__(self):
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def register(self, entry: typing.Optional[CacheEntry]) -> None:
+        """Учёт результата обращения к кэшу"""
+        if entry is None:
+            self.misses += 1
+        elif entry.is_stale:
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+
+    @property
+    def hit_rate(self) -> float:
+        """Доля обращений, для которых значение нашлось в кэше"""
+        total = self.hits + self.stale_hits + self.misses
+        return (self.hits + self.stale_hits) / total if total else 0.0
+
+    def as_dict(self) -> dict[str, typing.Union[int, float]]:
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+    def __str__(self):
+        return " ".join(f"{key}={value}" for key, value in self.as_dict().items())
+
 
 class BaseCache(ABC):
     """Базоывй класс для кэширования запросов к Ленте"""
 
+    def __init__(self, stale_ratio: float = 0.0):
+        """
+        :param stale_ratio: Доля от времени жизни записи, в течение которой
+        после устаревания отдаётся старое значение, пока оно обновляется
+        """
+        self._stale_ratio = stale_ratio
+        self.stats = CacheStats()
+
+    def _stale_ttl(self, ttl: int) -> int:
+        """
+        Получение длительности окна отдачи устаревшего значения
+        :param ttl: Время жизни записи в кэше в секундах
+        :return: Длительность окна в секундах
+        """
+        return int(ttl * self._stale_ratio)
+
     @abstractmethod
     async def set(self, key: str, value: typing.Union[dict, list], ttl: int) -> None:
         """
@@ -15,13 +83,78 @@ class BaseCache(ABC):
         :return:
         """
 
-    @abstractmethod
     async def get(self, key: str) -> typing.Optional[typing.Union[list, dict]]:
         """
-        Получение значения из кэша
+        Получение значения из кэша, в том числе устаревшего
         :param key: Ключ
         :return: Значение по ключу
         """
+        entry = await self.get_entry(key)
+        return entry.value if entry is not None else None
+
+    async def get_entry(self, key: str) -> typing.Optional[CacheEntry]:
+        """
+        Получение записи из кэша с учётом статистики
+        :param key: Ключ
+        :return: Запись по ключу
+        """
+        entry = await self._get_entry(key)
+        self.stats.register(entry)
+        return entry
+
+    @abstractmethod
+    async def _get_entry(self, key: str) -> typing.Optional[CacheEntry]:
+        """
+        Получение записи из хранилища
+        :param key: Ключ
+        :return: Запись, если она не была удалена
+        """
+
+    async def get_many(self, keys: list[str]) -> dict[str, typing.Union[list, dict]]:
+        """
+        Получение нескольких значений из кэша, в том числе устаревших
+        :param keys: Ключи
+        :return: Значения найденных ключей
+        """
+        entries = await self.get_entries(keys)
+        return {key: entry.value for key, entry in entries.items() if entry is not None}
+
+    async def get_entries(self, keys: list[str]) -> dict[str, typing.Optional[CacheEntry]]:
+        """
+        Получение нескольких записей из кэша с учётом статистики
+        :param keys: Ключи
+        :return: Записи по ключам
+        """
+        if not keys:
+            return {}
+        entries = await self._get_entries(keys)
+        for entry in entries.values():
+            self.stats.register(entry)
+        return entries
+
+    async def _get_entries(self, keys: list[str]) -> dict[str, typing.Optional[CacheEntry]]:
+        """
+        Получение нескольких записей из хранилища, по умолчанию по одной
+        :param keys: Ключи
+        :return: Записи по ключам
+        """
+        return {key: await self._get_entry(key) for key in keys}
+
+    async def set_many(self, items: dict[str, typing.Union[dict, list]], ttl: int) -> None:
+        """
+        Сохранение нескольких значений в кэш, по умолчанию по одному
+        :param items: Значения по ключам
+        :param ttl: Время жизни записей в кэше в секундах
+        """
+        for key, value in items.items():
+            await self.set(key, value, ttl)
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """
+        Удаление значения из кэша
+        :param key: Ключ
+        """
 
     @abstractmethod
     async def reset_all(self) -> None:
@@ -38,13 +171,25 @@ class BaseCache(ABC):
         """
 
 
+def _key_value(value: typing.Any) -> str:
+    """Приведение значения параметра к строке, одинаковой для одинаковых значений"""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
 def create_key_by_args(*args, **kwargs) -> str:
     """
     Формирование ключа по списку параметров
+    Именованные параметры сортируются, параметры со значением None не учитываются,
+    поэтому одинаковые запросы получают один ключ. Длинные ключи заменяются хэшем
     :param args: Список параметров
     :param kwargs: Словарь параметров
     :return: Ключ для кэширования
     """
-    dict_args = [f"{key}:{value}" for key, value in kwargs.items()]
+    dict_args = [f"{key}:{_key_value(value)}" for key, value in sorted(kwargs.items()) if value is not None]
     key = "_".join([*args, *dict_args])
+    if len(key) > MAX_KEY_LENGTH:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        key = f"{key[:KEY_READABLE_LENGTH]}#{digest}"
     return key
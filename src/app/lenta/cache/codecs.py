@@ -0,0 +1,256 @@
+"""
+Сериализация записей кэша
+
+Запись состоит из заголовка и данных. Заголовок содержит версию формата,
+кодек и способ сжатия, поэтому записи, сохранённые с другими настройками,
+читаются без ошибок. Библиотеки orjson, msgpack, zstandard и lz4 необязательны:
+без orjson используется стандартный json, остальные кодеки без своих библиотек недоступны
+"""
+import json
+import struct
+import typing
+from abc import ABC, abstractmethod
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+MAGIC = b"LC"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("!2sBBB")  # Метка, версия формата, кодек, сжатие
+DEFAULT_COMPRESS_THRESHOLD = 1024  # Размер данных в байтах, начиная с которого они сжимаются
+
+
+class CodecError(ValueError):
+    """Ошибка сериализации записи кэша"""
+
+
+class Codec(ABC):
+    """Преобразование значения в байты и обратно"""
+    id: int
+    name: str
+
+    @abstractmethod
+    def encode(self, value: typing.Any) -> bytes:
+        """
+        Преобразование значения в байты
+        :param value: Значение
+        :return: Данные
+        """
+
+    @abstractmethod
+    def decode(self, data: bytes) -> typing.Any:
+        """
+        Получение значения из байтов
+        :param data: Данные
+        :return: Значение
+        """
+
+
+class JsonCodec(Codec):
+    """JSON, при наличии orjson используется он"""
+    id = 1
+    name = "json"
+
+    def encode(self, value: typing.Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(value)
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+    def decode(self, data: bytes) -> typing.Any:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+
+class MsgpackCodec(Codec):
+    id = 2
+    name = "msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise CodecError("msgpack codec requires the msgpack package")
+
+    def encode(self, value: typing.Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def decode(self, data: bytes) -> typing.Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+class Compression(ABC):
+    """Сжатие данных"""
+    id: int
+    name: str
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """
+        Сжатие данных
+        :param data: Данные
+        :return: Сжатые данные
+        """
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        """
+        Распаковка данных
+        :param data: Сжатые данные
+        :return: Данные
+        """
+
+
+class NoCompression(Compression):
+    id = 0
+    name = "none"
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+
+class ZstdCompression(Compression):
+    id = 1
+    name = "zstd"
+
+    def __init__(self, level: int = 3):
+        if zstandard is None:
+            raise CodecError("zstd compression requires the zstandard package")
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+
+class Lz4Compression(Compression):
+    id = 2
+    name = "lz4"
+
+    def __init__(self):
+        if lz4_frame is None:
+            raise CodecError("lz4 compression requires the lz4 package")
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4_frame.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lz4_frame.decompress(data)
+
+
+CODECS: dict[str, typing.Type[Codec]] = {codec.name: codec for codec in (JsonCodec, MsgpackCodec)}
+COMPRESSIONS: dict[str, typing.Type[Compression]] = {
+    compression.name: compression for compression in (NoCompression, ZstdCompression, Lz4Compression)
+}
+
+
+def check_codec(name: str) -> str:
+    """
+    Проверка, что кодек известен и его библиотека установлена
+    :raises CodecError: Кодек недоступен
+    """
+    if name not in CODECS:
+        raise CodecError(f"Unknown cache codec: {name}, available: {', '.join(CODECS)}")
+    CODECS[name]()
+    return name
+
+
+def check_compression(name: str) -> str:
+    """
+    Проверка, что способ сжатия известен и его библиотека установлена
+    :raises CodecError: Способ сжатия недоступен
+    """
+    if name not in COMPRESSIONS:
+        raise CodecError(f"Unknown cache compression: {name}, available: {', '.join(COMPRESSIONS)}")
+    COMPRESSIONS[name]()
+    return name
+
+
+class CacheSerializer:
+    """Сериализация записей кэша выбранным кодеком со сжатием больших записей"""
+
+    def __init__(
+            self,
+            codec: str = JsonCodec.name,
+            compression: str = NoCompression.name,
+            compress_threshold: int = DEFAULT_COMPRESS_THRESHOLD,
+    ):
+        """
+        :param codec: Название кодека для новых записей
+        :param compression: Название способа сжатия для новых записей
+        :param compress_threshold: Размер данных в байтах, начиная с которого они сжимаются
+        """
+        check_codec(codec)
+        check_compression(compression)
+
+        self._codec = CODECS[codec]()
+        self._compression = COMPRESSIONS[compression]()
+        self._compress_threshold = compress_threshold
+        # Кодеки для чтения создаются при первой встрече записи с ними
+        self._codecs: dict[int, Codec] = {self._codec.id: self._codec}
+        self._compressions: dict[int, Compression] = {
+            self._compression.id: self._compression,
+            NoCompression.id: NoCompression(),
+        }
+
+    def dumps(self, value: typing.Any) -> bytes:
+        """Преобразование значения в запись"""
+        data = self._codec.encode(value)
+        compression = self._compression
+        if len(data) < self._compress_threshold:
+            compression = self._compressions[NoCompression.id]
+        return HEADER.pack(MAGIC, FORMAT_VERSION, self._codec.id, compression.id) + compression.compress(data)
+
+    def loads(self, record: bytes) -> typing.Any:
+        """
+        Получение значения из записи
+        :raises CodecError: Запись другого формата или неизвестный кодек
+        """
+        if len(record) < HEADER.size:
+            raise CodecError("Cache record is too short")
+        magic, version, codec_id, compression_id = HEADER.unpack_from(record)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise CodecError("Unsupported cache record format")
+
+        codec = self._get_codec(codec_id)
+        compression = self._get_compression(compression_id)
+        return codec.decode(compression.decompress(record[HEADER.size:]))
+
+    def _get_codec(self, codec_id: int) -> Codec:
+        if codec_id not in self._codecs:
+            codec_type = next((codec for codec in CODECS.values() if codec.id == codec_id), None)
+            if codec_type is None:
+                raise CodecError(f"Unknown cache codec id: {codec_id}")
+            self._codecs[codec_id] = codec_type()
+        return self._codecs[codec_id]
+
+    def _get_compression(self, compression_id: int) -> Compression:
+        if compression_id not in self._compressions:
+            compression_type = next(
+                (compression for compression in COMPRESSIONS.values() if compression.id == compression_id), None,
+            )
+            if compression_type is None:
+                raise CodecError(f"Unknown cache compression id: {compression_id}")
+            self._compressions[compression_id] = compression_type()
+        return self._compressions[compression_id]
@@ -1,56 +1,266 @@
+import asyncio
+import json
+import logging
 import time
 import typing
+from collections import OrderedDict
 
-from .base import BaseCache
+from .base import BaseCache, CacheEntry, CacheStats
 
+logger = logging.getLogger(__name__)
 
-class MemoryCache(BaseCache):
+
+class EvictionPolicy:
+    LRU = "lru"  # Вытесняется запись, к которой дольше всего не обращались
+    LFU = "lfu"  # Вытесняется запись с наименьшим кол-вом обращений
+
+
+def estimate_size(value: typing.Any) -> int:
+    """
+    Приблизительная оценка размера значения в байтах
+    :param value: Значение
+    :return: Размер сериализованного в JSON значения
+    """
+    return len(json.dumps(value, ensure_ascii=False, default=str))
+
+
+class MemoryCacheStats(CacheStats):
+    """Статистика кэша в памяти"""
 
     def __init__(self):
-        self._data = {}  # Словарь для хранения значений
-        self._expired_info = {}  # Словарь для хранения информации об истечении жизни значения в кэше
+        super().__init__()
+        self.entries = 0
+        self.size_bytes = 0
+        self.evictions = 0
+        self.expirations = 0
 
-    async def set(self, key: str, value: typing.Union[dict, list], ttl: int) -> None:
-        self._data[key] = value
-        self._expired_info[key] = time.time() + ttl
+    def as_dict(self) -> dict[str, typing.Union[int, float]]:
+        return {
+            **super().as_dict(),
+            "entries": self.entries,
+            "size_bytes": self.size_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
 
-    async def get(self, key: str) -> typing.Optional[typing.Union[list, dict]]:
-        if self._is_key_exists(key) and self._is_key_relevant(key):
-            return self._data[key]
-        return None
 
-    def _is_key_exists(self, key: str) -> bool:
-        """
-        Проверка существования ключа
-        :param key: Ключ
-        :return:
-        """
-        # Проверка, что ключ есть в словаре
-        return key in self._data
+class _Item:
+    __slots__ = ("value", "stale_at", "expires_at", "size")
+
+    def __init__(self, value: typing.Any, stale_at: float, expires_at: float, size: int):
+        self.value = value
+        self.stale_at = stale_at
+        self.expires_at = expires_at
+        self.size = size
+
+
+class _LruOrder:
+    """Порядок вытеснения по давности обращения"""
+
+    def __init__(self):
+        self._keys: OrderedDict[str, None] = OrderedDict()
+
+    def add(self, key: str) -> None:
+        self._keys[key] = None
+
+    def touch(self, key: str) -> None:
+        self._keys.move_to_end(key)
+
+    def remove(self, key: str) -> None:
+        self._keys.pop(key, None)
+
+    def victim(self) -> str:
+        return next(iter(self._keys))
+
+    def clear(self) -> None:
+        self._keys.clear()
+
+
+class _LfuOrder:
+    """Порядок вытеснения по частоте обращений, при равной частоте - по давности"""
+
+    def __init__(self):
+        self._freqs: dict[str, int] = {}
+        self._buckets: dict[int, OrderedDict[str, None]] = {}
+        self._min_freq = 0
+
+    def add(self, key: str) -> None:
+        self._freqs[key] = 1
+        self._buckets.setdefault(1, OrderedDict())[key] = None
+        self._min_freq = 1
+
+    def touch(self, key: str) -> None:
+        freq = self._freqs[key]
+        self._remove_from_bucket(key, freq)
+        self._freqs[key] = freq + 1
+        self._buckets.setdefault(freq + 1, OrderedDict())[key] = None
+        if self._min_freq == freq and freq not in self._buckets:
+            self._min_freq = freq + 1
+
+    def remove(self, key: str) -> None:
+        freq = self._freqs.pop(key, None)
+        if freq is not None:
+            self._remove_from_bucket(key, freq)
 
-    def _is_key_relevant(self, key: str) -> bool:
+    def victim(self) -> str:
+        if self._min_freq not in self._buckets:
+            self._min_freq = min(self._buckets)
+        return next(iter(self._buckets[self._min_freq]))
+
+    def clear(self) -> None:
+        self._freqs.clear()
+        self._buckets.clear()
+        self._min_freq = 0
+
+    def _remove_from_bucket(self, key: str, freq: int) -> None:
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[freq]
+
+
+class MemoryCache(BaseCache):
+    """
+    Кэш в памяти процесса с ограничением по кол-ву записей и объёму
+    Устаревшие записи удаляются при обращении и периодической очисткой
+    """
+
+    def __init__(
+            self,
+            stale_ratio: float = 0.0,
+            max_entries: typing.Optional[int] = None,
+            max_bytes: typing.Optional[int] = None,
+            policy: str = EvictionPolicy.LRU,
+            sweep_interval: float = 60.0,
+            size_func: typing.Callable[[typing.Any], int] = estimate_size,
+    ):
         """
-        Проверка актуальности ключа в кэше
-        :param key: Ключ
-        :return: Результат проверки
+        :param stale_ratio: Доля от времени жизни записи для отдачи устаревшего значения
+        :param max_entries: Максимальное кол-во записей
+        :param max_bytes: Приблизительный максимальный объём записей в байтах
+        :param policy: Политика вытеснения записей
+        :param sweep_interval: Интервал удаления истёкших записей в секундах, 0 - не удалять
+        :param size_func: Функция оценки размера значения
         """
-        expired_time = self._expired_info.get(key)
-        if expired_time is None:
-            return False
-        if expired_time < time.time():
+        super().__init__(stale_ratio)
+        if policy == EvictionPolicy.LRU:
+            self._order = _LruOrder()
+        elif policy == EvictionPolicy.LFU:
+            self._order = _LfuOrder()
+        else:
+            raise ValueError(f"Unknown eviction policy: {policy}")
+
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._sweep_interval = sweep_interval
+        self._size_func = size_func
+        self._items: dict[str, _Item] = {}
+        self._sweep_task: typing.Optional[asyncio.Task] = None
+        self.stats = MemoryCacheStats()
+
+    async def set(self, key: str, value: typing.Union[dict, list], ttl: int) -> None:
+        self._ensure_sweeper()
+        self._store(key, value, ttl)
+
+    async def set_many(self, items: dict[str, typing.Union[dict, list]], ttl: int) -> None:
+        self._ensure_sweeper()
+        for key, value in items.items():
+            self._store(key, value, ttl)
+
+    def _store(self, key: str, value: typing.Union[dict, list], ttl: int) -> None:
+        """Сохранение значения с вытеснением записей при превышении ограничений"""
+        self._delete_key(key)
+
+        # Оценка размера нужна только при ограничении объёма
+        size = self._size_func(value) if self._max_bytes else 0
+        if self._max_bytes and size > self._max_bytes:
+            return
+
+        while self._items and self._is_over_limit(size):
+            self._evict()
+
+        now = time.time()
+        self._items[key] = _Item(value, now + ttl, now + ttl + self._stale_ttl(ttl), size)
+        self._order.add(key)
+        self.stats.size_bytes += size
+        self.stats.entries = len(self._items)
+
+    async def _get_entry(self, key: str) -> typing.Optional[CacheEntry]:
+        return self._read(key, time.time())
+
+    async def _get_entries(self, keys: list[str]) -> dict[str, typing.Optional[CacheEntry]]:
+        now = time.time()
+        return {key: self._read(key, now) for key in keys}
+
+    def _read(self, key: str, now: float) -> typing.Optional[CacheEntry]:
+        """Получение записи с удалением истёкшей"""
+        item = self._items.get(key)
+        if item is None:
+            return None
+        if item.expires_at < now:
             self._delete_key(key)
-            return False
+            self.stats.expirations += 1
+            return None
+
+        self._order.touch(key)
+        return CacheEntry(item.value, item.stale_at)
+
+    async def delete(self, key: str) -> None:
+        self._delete_key(key)
+
+    def _is_over_limit(self, new_size: int) -> bool:
+        """Проверка, что добавление записи превысит ограничения кэша"""
+        if self._max_entries is not None and len(self._items) + 1 > self._max_entries:
+            return True
+        return bool(self._max_bytes) and self.stats.size_bytes + new_size > self._max_bytes
 
-        return True
+    def _evict(self) -> None:
+        """Вытеснение записи согласно политике"""
+        self._delete_key(self._order.victim())
+        self.stats.evictions += 1
 
     def _delete_key(self, key) -> None:
         """Удаление ключа из кэша"""
-        self._data.pop(key, None)
-        self._expired_info.pop(key, None)
+        item = self._items.pop(key, None)
+        if item is None:
+            return
+        self._order.remove(key)
+        self.stats.size_bytes -= item.size
+        self.stats.entries = len(self._items)
+
+    def sweep(self) -> int:
+        """
+        Удаление истёкших записей
+        :return: Кол-во удалённых записей
+        """
+        now = time.time()
+        expired_keys = [key for key, item in self._items.items() if item.expires_at < now]
+        for key in expired_keys:
+            self._delete_key(key)
+        self.stats.expirations += len(expired_keys)
+        return len(expired_keys)
+
+    def _ensure_sweeper(self) -> None:
+        """Запуск периодической очистки при первой записи"""
+        if self._sweep_interval and self._sweep_task is None:
+            self._sweep_task = asyncio.get_event_loop().create_task(self._sweep_loop())
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error("Memory cache sweep failed: %r", e)
 
     async def reset_all(self) -> None:
-        self._data = {}
-        self._expired_info = {}
+        self._items = {}
+        self._order.clear()
+        self.stats.size_bytes = 0
+        self.stats.entries = 0
 
     async def close(self) -> None:
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            self._sweep_task = None
         await self.reset_all()
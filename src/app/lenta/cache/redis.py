@@ -1,10 +1,19 @@
 import asyncio
-import json
+import logging
+import time
 import typing
 
 import aioredis
 
-from .base import BaseCache
+from .base import BaseCache, CacheEntry, KEY_SCHEMA_VERSION
+from .codecs import CacheSerializer, CodecError
+
+logger = logging.getLogger(__name__)
+
+RESET_BATCH_SIZE = 1000  # Кол-во ключей, удаляемых за раз при очистке кэша
+
+# Недоступность Redis не должна ломать запросы, кэш в этом случае пропускается
+REDIS_ERRORS = (aioredis.RedisError, OSError)
 
 
 class RedisCache(BaseCache):
@@ -18,15 +27,20 @@ class RedisCache(BaseCache):
                  pool_size: int = 10,
                  prefix_key: str = "lenta_cache",
                  loop: typing.Optional[asyncio.AbstractEventLoop] = None,
+                 stale_ratio: float = 0.0,
+                 serializer: typing.Optional[CacheSerializer] = None,
                  **kwargs
                  ):
+        super().__init__(stale_ratio)
+        self._serializer = serializer or CacheSerializer()
         self._host = host
         self._port = port
         self._db = db
         self._password = password
         self._ssl = ssl
         self._pool_size = pool_size
-        self._prefix_key = prefix_key
+        # Ключи кэша отделены от других данных в Redis и от ключей другого формата
+        self._prefix_key = f"{prefix_key}:v{KEY_SCHEMA_VERSION}:"
         self._loop = loop or asyncio.get_event_loop()
         self._connection_lock = asyncio.Lock(loop=self._loop)
         self._redis: typing.Optional[aioredis.Redis] = None
@@ -46,24 +60,117 @@ class RedisCache(BaseCache):
                     password=self._password,
                     ssl=self._ssl,
                     max_connections=self._pool_size,
-                    decode_responses=True,
+                    decode_responses=False,
                     **self._kwargs,
                 )
         return self._redis
 
-    async def get(self, key: str) -> typing.Optional[typing.Union[list, dict]]:
+    def _key(self, key: str) -> str:
+        """Получение ключа Redis для ключа кэша"""
+        return self._prefix_key + key
+
+    async def _get_entry(self, key: str) -> typing.Optional[CacheEntry]:
         redis = await self._get_redis()
-        raw_value = await redis.get(key)
-        return json.loads(raw_value)
+        try:
+            raw_value = await redis.get(self._key(key))
+        except REDIS_ERRORS as e:
+            logger.warning("Redis cache read failed: %r", e)
+            return None
+        return self._decode(raw_value)
+
+    async def _get_entries(self, keys: list[str]) -> dict[str, typing.Optional[CacheEntry]]:
+        redis = await self._get_redis()
+        try:
+            raw_values = await redis.mget([self._key(key) for key in keys])
+        except REDIS_ERRORS as e:
+            logger.warning("Redis cache read failed: %r", e)
+            return dict.fromkeys(keys)
+        return {key: self._decode(raw_value) for key, raw_value in zip(keys, raw_values)}
+
+    def _decode(self, raw_value: typing.Optional[bytes]) -> typing.Optional[CacheEntry]:
+        """Получение записи из сохранённого значения, отсутствующая или повреждённая запись считается промахом"""
+        if raw_value is None:
+            return None
+        # Записи старого формата считаем отсутствующими, они будут перезаписаны
+        try:
+            data = self._serializer.loads(raw_value)
+            return CacheEntry(data["value"], float(data["expires_at"]))
+        except CodecError:
+            return None
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning("Broken Redis cache record: %r", e)
+            return None
+
+    def _encode(self, value: typing.Union[dict, list], ttl: int) -> bytes:
+        """Формирование сохраняемого значения"""
+        # Время устаревания хранится рядом со значением, а Redis удаляет запись после окна устаревания
+        return self._serializer.dumps({"value": value, "expires_at": time.time() + ttl})
 
     async def set(self, key: str, value: typing.Union[dict, list], ttl: int) -> None:
         redis = await self._get_redis()
-        json_value = json.dumps(value)
-        await redis.set(key, json_value, ttl)
+        try:
+            await redis.set(self._key(key), self._encode(value, ttl), ttl + self._stale_ttl(ttl))
+        except REDIS_ERRORS as e:
+            logger.warning("Redis cache write failed: %r", e)
+
+    async def set_many(self, items: dict[str, typing.Union[dict, list]], ttl: int) -> None:
+        if not items:
+            return
+        redis = await self._get_redis()
+        try:
+            # MSET не поддерживает время жизни, поэтому команды SET отправляются одним пакетом
+            async with redis.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.set(self._key(key), self._encode(value, ttl), ttl + self._stale_ttl(ttl))
+                await pipe.execute()
+        except REDIS_ERRORS as e:
+            logger.warning("Redis cache write failed: %r", e)
+
+    async def delete(self, key: str) -> None:
+        redis = await self._get_redis()
+        try:
+            await redis.delete(self._key(key))
+        except REDIS_ERRORS as e:
+            logger.warning("Redis cache delete failed: %r", e)
+
+    async def publish(self, channel: str, message: str) -> None:
+        """
+        Отправка сообщения в канал
+        :param channel: Канал
+        :param message: Сообщение
+        """
+        redis = await self._get_redis()
+        await redis.publish(channel, message)
+
+    async def listen(self, channel: str) -> typing.AsyncIterator[str]:
+        """
+        Получение сообщений канала
+        :param channel: Канал
+        :return: Сообщения, поступающие в канал
+        """
+        redis = await self._get_redis()
+        pubsub = redis.pubsub()
+        await pubsub.subscribe(channel)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    data = message["data"]
+                    yield data.decode() if isinstance(data, bytes) else data
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.close()
 
     async def reset_all(self) -> None:
-        if self._redis:
-            await self._redis.flushdb()
+        # Удаляем только ключи кэша, в той же базе могут храниться состояния бота
+        redis = await self._get_redis()
+        keys = []
+        async for key in redis.scan_iter(match=f"{self._prefix_key}*", count=RESET_BATCH_SIZE):
+            keys.append(key)
+            if len(keys) >= RESET_BATCH_SIZE:
+                await redis.unlink(*keys)
+                keys = []
+        if keys:
+            await redis.unlink(*keys)
 
     async def close(self):
         if self._redis:
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import logging
+import time
+import typing
+import uuid
+
+from .base import BaseCache, CacheEntry
+from .memory import MemoryCache
+from .redis import RedisCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_L1_TTL = 60  # Максимальное время жизни записи в памяти процесса в секундах
+INVALIDATION_CHANNEL = "lenta_cache:invalidate"
+RESET_ALL = "*"  # Ключ сообщения об очистке всего кэша
+RECONNECT_DELAY = 1.0  # Пауза перед повторной подпиской после ошибки в секундах
+
+
+class TieredCache(BaseCache):
+    """
+    Двухуровневый кэш: небольшой кэш в памяти процесса поверх общего Redis
+    Запись в памяти живёт не дольше, чем до устаревания записи в Redis.
+    Изменения рассылаются через pub/sub, по ним экземпляры бота удаляют свои копии
+    """
+
+    def __init__(
+            self,
+            l1: MemoryCache,
+            l2: RedisCache,
+            l1_ttl: int = DEFAULT_L1_TTL,
+            channel: str = INVALIDATION_CHANNEL,
+    ):
+        """
+        :param l1: Кэш в памяти процесса, без окна устаревания
+        :param l2: Общий кэш в Redis
+        :param l1_ttl: Максимальное время жизни записи в памяти процесса в секундах
+        :param channel: Канал pub/sub для сообщений об изменениях
+        """
+        super().__init__()
+        self._l1 = l1
+        self._l2 = l2
+        self._l1_ttl = l1_ttl
+        self._channel = channel
+        # Свои сообщения получаются из канала наравне с чужими, по этому идентификатору они пропускаются
+        self._instance_id = uuid.uuid4().hex
+        self._listener: typing.Optional[asyncio.Task] = None
+
+    async def _get_entry(self, key: str) -> typing.Optional[CacheEntry]:
+        self._ensure_listener()
+        entry = await self._l1.get_entry(key)
+        if entry is not None:
+            return entry
+
+        entry = await self._l2.get_entry(key)
+        if entry is not None:
+            await self._fill_l1({key: entry})
+        return entry
+
+    async def _get_entries(self, keys: list[str]) -> dict[str, typing.Optional[CacheEntry]]:
+        self._ensure_listener()
+        entries = await self._l1.get_entries(keys)
+        missing_keys = [key for key, entry in entries.items() if entry is None]
+        if missing_keys:
+            l2_entries = await self._l2.get_entries(missing_keys)
+            await self._fill_l1({key: entry for key, entry in l2_entries.items() if entry is not None})
+            entries.update(l2_entries)
+        return entries
+
+    async def _fill_l1(self, entries: dict[str, CacheEntry]) -> None:
+        """Сохранение записей из Redis в память на оставшееся до их устаревания время"""
+        now = time.time()
+        for key, entry in entries.items():
+            ttl = min(self._l1_ttl, int(entry.expires_at - now))
+            # Устаревшие записи не копируем, их обновление должно дойти до Redis
+            if ttl > 0:
+                await self._l1.set(key, entry.value, ttl)
+
+    async def set(self, key: str, value: typing.Union[dict, list], ttl: int) -> None:
+        self._ensure_listener()
+        await self._l2.set(key, value, ttl)
+        await self._l1.set(key, value, min(self._l1_ttl, ttl))
+        await self._publish([key])
+
+    async def set_many(self, items: dict[str, typing.Union[dict, list]], ttl: int) -> None:
+        if not items:
+            return
+        self._ensure_listener()
+        await self._l2.set_many(items, ttl)
+        await self._l1.set_many(items, min(self._l1_ttl, ttl))
+        await self._publish(list(items))
+
+    async def delete(self, key: str) -> None:
+        await self._l2.delete(key)
+        await self.invalidate([key])
+
+    async def invalidate(self, keys: list[str]) -> None:
+        """
+        Удаление записей из памяти всех экземпляров без изменения Redis
+        :param keys: Ключи
+        """
+        for key in keys:
+            await self._l1.delete(key)
+        await self._publish(keys)
+
+    async def reset_all(self) -> None:
+        await self._l2.reset_all()
+        await self._l1.reset_all()
+        await self._publish([RESET_ALL])
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        await self._l1.close()
+        await self._l2.close()
+
+    async def _publish(self, keys: list[str]) -> None:
+        """Отправка сообщения об изменении записей другим экземплярам"""
+        message = json.dumps({"source": self._instance_id, "keys": keys})
+        try:
+            await self._l2.publish(self._channel, message)
+        except Exception as e:
+            logger.warning("Failed to publish cache invalidation: %r", e)
+
+    def _ensure_listener(self) -> None:
+        """Подписка на сообщения об изменениях при первом обращении"""
+        if self._listener is None:
+            self._listener = asyncio.get_event_loop().create_task(self._listen_loop())
+
+    async def _listen_loop(self) -> None:
+        while True:
+            try:
+                async for message in self._l2.listen(self._channel):
+                    await self._handle_message(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Cache invalidation subscription failed: %r", e)
+            # Пока подписки не было, сообщения могли быть пропущены
+            await self._l1.reset_all()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _handle_message(self, message: str) -> None:
+        try:
+            data = json.loads(message)
+            source, keys = data["source"], data["keys"]
+        except (ValueError, TypeError, KeyError):
+            logger.warning("Broken cache invalidation message: %s", message)
+            return
+        if source == self._instance_id:
+            return
+        if RESET_ALL in keys:
+            await self._l1.reset_all()
+            return
+        for key in keys:
+            await self._l1.delete(key)
@@ -1,12 +1,17 @@
 import asyncio
-from typing import Optional, Union
+import time
+from typing import Any, Awaitable, Callable, Optional, Union
 
 from . import models
 from .api import ApiService, ApiMethods
-from .cache.base import BaseCache
+from .cache.base import BaseCache, create_key_by_args
 from .consts import DAY, HOUR, MINUTE
+from .index import CatalogIndex, StoreIndex
 
 LENTA_BASE_URL = "https://lenta.com/api"
+SKUS_CHUNK_SIZE = 100  # Максимальное кол-во товаров в одном запросе списка товаров
+SKUS_CHUNK_CONCURRENCY = 4  # Максимальное кол-во одновременных запросов списка товаров
+SKU_CACHE_TIME = MINUTE * 5  # Время жизни товара магазина в кэше
 FAKE_USER_AGENT = "Mozilla/5.0 (iPhone; CPU iPhone OS 12_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) " \
                   "CriOS/69.0.3497.105 Mobile/15E148 Safari/605.1"
 
@@ -19,6 +24,11 @@ class LentaClient:
             base_url: str = LENTA_BASE_URL,
             cache_storage: Optional[BaseCache] = None,
             api_service: Optional[ApiService] = None,
+            skus_chunk_size: int = SKUS_CHUNK_SIZE,
+            object_cache: Optional[BaseCache] = None,
+            sku_observer: Optional[Callable[[str, list[models.BaseSku]], None]] = None,
+            request_limiter: Optional[Callable[[], Awaitable[None]]] = None,
+            skus_chunk_concurrency: int = SKUS_CHUNK_CONCURRENCY,
     ):
         self._main_loop = loop
         self._base_url = base_url
@@ -26,6 +36,28 @@ class LentaClient:
             api_service = ApiService(cache=cache_storage)
 
         self._api_service = api_service
+        # Кэш ответов API, товары магазина кэшируются в нём по отдельности
+        self._cache_storage = cache_storage
+        self._skus_chunk_size = skus_chunk_size
+        # Запросы списка товаров ограничиваются по частоте и кол-ву одновременных
+        # для всех магазинов сразу, а не для каждого вызова отдельно
+        self._request_limiter = request_limiter
+        self._skus_chunk_semaphore = asyncio.Semaphore(skus_chunk_concurrency)
+        # Кэш разобранных моделей, позволяет не выполнять валидацию ответа при каждом обращении
+        self._object_cache = object_cache
+        # Получатель всех полученных цен товаров, например, для записи истории цен
+        self._sku_observer = sku_observer
+
+    def _observe_skus(self, store_id: str, skus: list[models.BaseSku]) -> list[models.BaseSku]:
+        """
+        Передача полученных товаров магазина наблюдателю
+        :param store_id: Идентификатор магазина
+        :param skus: Товары
+        :return: Те же товары
+        """
+        if self._sku_observer is not None and skus:
+            self._sku_observer(store_id, skus)
+        return skus
 
     async def request(
             self,
@@ -52,29 +84,72 @@ class LentaClient:
             cache_time,
         )
 
+    async def request_object(
+            self,
+            api_method: str,
+            parse: Callable[[Union[dict, list]], Any],
+            cache_time: int,
+            object_name: str = "objects",
+    ) -> Any:
+        """
+        Выполнение GET запроса с кэшированием разобранного результата
+        Кэшируемый результат не должен изменяться, поэтому модели неизменяемы,
+        а списки хранятся в виде кортежей
+        :param api_method: Метод API
+        :param parse: Функция разбора ответа
+        :param cache_time: Время жизни ответа в кэше, результат живёт не дольше ответа
+        :param object_name: Название объекта, если по одному методу кэшируются разные объекты
+        :return: Разобранный результат
+        """
+        if self._object_cache is None:
+            return parse(await self.request(api_method, "GET", cache_time=cache_time))
+
+        cache_key = create_key_by_args(object_name, api_method)
+        cached_object = await self._object_cache.get(cache_key)
+        if cached_object is not None:
+            return cached_object
+
+        entry = await self._api_service.api_request_entry("GET", api_method, cache_time=cache_time)
+        result = parse(entry.value)
+        # Результат живёт не дольше ответа, иначе разобранный устаревший ответ
+        # пережил бы обновление ответа в кэше. Устаревший ответ не кэшируется
+        ttl = min(cache_time, int(entry.expires_at - time.time()))
+        if ttl > 0:
+            await self._object_cache.set(cache_key, result, ttl)
+        return result
+
     async def get_cities(self) -> list[models.City]:
         """
         Получение списка городов, в которых есть магазины Ленты
         :return: Список городов
         """
-        result = await self.request(
+        cities = await self.request_object(
             ApiMethods.GET_CITIES,
-            "GET",
-            cache_time=DAY
+            lambda result: tuple(models.City(**city) for city in result),
+            cache_time=DAY,
         )
-        return [models.City(**city) for city in result]
+        return list(cities)
 
     async def get_stores(self) -> list[models.Store]:
         """
         Получение списка магазинов Ленты
         :return:  Список магазинов
         """
-        result = await self.request(
+        store_index = await self.get_store_index()
+        return list(store_index.stores)
+
+    async def get_store_index(self) -> StoreIndex:
+        """
+        Получение пространственного индекса магазинов Ленты
+        Индекс перестраивается вместе с обновлением списка магазинов
+        :return: Индекс магазинов
+        """
+        return await self.request_object(
             ApiMethods.GET_STORES,
-            "GET",
-            cache_time=DAY
+            lambda result: StoreIndex([models.Store(**store) for store in result]),
+            cache_time=DAY,
+            object_name="store_index",
         )
-        return [models.Store(**store) for store in result]
 
     async def get_city_stores(self, city_id: str) -> list[models.Store]:
         """
@@ -82,12 +157,12 @@ class LentaClient:
         :param city_id: Идентификатор города
         :return: Список магазинов для города
         """
-        result = await self.request(
+        stores = await self.request_object(
             ApiMethods.GET_CITY_STORES.format(city_id=city_id),
-            "GET",
-            cache_time=DAY
+            lambda result: tuple(models.Store(**store) for store in result),
+            cache_time=DAY,
         )
-        return [models.Store(**store) for store in result]
+        return list(stores)
 
     async def search_skus_in_store(
             self, store_id: str, search_value: Optional[str] = None, limit: int = 10, offset: int = 0,
@@ -122,7 +197,7 @@ class LentaClient:
             "POST",
             json=payload,
         )
-        return [models.BaseSku(**sku) for sku in result["skus"]]
+        return self._observe_skus(store_id, [models.BaseSku(**sku) for sku in result["skus"]])
 
     async def get_store(self, store_id: str) -> models.Store:
         """
@@ -131,12 +206,11 @@ class LentaClient:
         :return: Магазин
         """
 
-        result = await self.request(
+        return await self.request_object(
             ApiMethods.GET_STORE.format(store_id=store_id),
-            "GET",
-            cache_time=DAY
+            lambda result: models.Store(**result),
+            cache_time=DAY,
         )
-        return models.Store(**result)
 
     async def get_sku_in_store_by_barcode(self, store_id: str, barcode: str) -> models.BaseSku:
         """
@@ -153,25 +227,83 @@ class LentaClient:
             },
             cache_time=HOUR
         )
-        return models.BaseSku(**result)
+        sku = models.BaseSku(**result)
+        self._observe_skus(store_id, [sku])
+        return sku
 
-    async def get_store_skus_by_ids(self, store_id: str, sku_ids: list[str]) -> list[models.BaseSku]:
+    async def get_store_skus_by_ids(self, store_id: str, sku_ids: list[str],
+                                    use_cache: bool = True) -> list[models.BaseSku]:
         """
         Получение товаров магазина по иденификаторам товаров
+        Товары кэшируются по отдельности и читаются из кэша одним запросом,
+        отсутствующие в кэше запрашиваются частями параллельно с общим ограничением
         :param store_id: Идетификатор магазина
         :param sku_ids: Идентификаторы товаров
+        :param use_cache: Читать товары из кэша, без него все товары запрашиваются заново,
+        а полученные сохраняются в кэш
         :return: Список товаров
         """
+        # Убираем повторы, сохраняя порядок товаров
+        unique_sku_ids = list(dict.fromkeys(sku_ids))
+        sku_data = await self._get_cached_skus(store_id, unique_sku_ids) if use_cache else {}
+
+        missing_sku_ids = [sku_id for sku_id in unique_sku_ids if sku_id not in sku_data]
+        chunks = [
+            missing_sku_ids[i:i + self._skus_chunk_size]
+            for i in range(0, len(missing_sku_ids), self._skus_chunk_size)
+        ]
+        results = await asyncio.gather(*[self._get_store_skus_chunk(store_id, chunk) for chunk in chunks])
+        fetched_skus = {sku["code"]: sku for chunk_skus in results for sku in chunk_skus}
+        if self._cache_storage is not None and fetched_skus:
+            await self._cache_storage.set_many(
+                {self._sku_cache_key(store_id, code): sku for code, sku in fetched_skus.items()},
+                SKU_CACHE_TIME,
+            )
+
+        sku_data.update(fetched_skus)
+        skus = {sku_id: models.BaseSku(**sku) for sku_id, sku in sku_data.items()}
+        self._observe_skus(store_id, [skus[sku_id] for sku_id in fetched_skus])
+        return [skus[sku_id] for sku_id in unique_sku_ids if sku_id in skus]
+
+    @classmethod
+    def _sku_cache_key(cls, store_id: str, sku_id: str) -> str:
+        return create_key_by_args("store_sku", store_id=store_id, code=sku_id)
+
+    async def _get_cached_skus(self, store_id: str, sku_ids: list[str]) -> dict[str, dict]:
+        """
+        Получение товаров магазина из кэша
+        Устаревшие товары считаются отсутствующими, чтобы их цены запросились заново
+        :param store_id: Идетификатор магазина
+        :param sku_ids: Идентификаторы товаров
+        :return: Найденные товары по идентификатору
+        """
+        if self._cache_storage is None or not sku_ids:
+            return {}
+        keys = {self._sku_cache_key(store_id, sku_id): sku_id for sku_id in sku_ids}
+        entries = await self._cache_storage.get_entries(list(keys))
+        return {
+            keys[key]: entry.value for key, entry in entries.items()
+            if entry is not None and not entry.is_stale
+        }
+
+    async def _get_store_skus_chunk(self, store_id: str, sku_ids: list[str]) -> list[dict]:
+        """
+        Получение части списка товаров магазина
+        :param store_id: Идетификатор магазина
+        :param sku_ids: Идентификаторы товаров
+        :return: Список товаров в формате ответа API
+        """
         payload = {
             "skuCodes": sku_ids
         }
-        result = await self.request(
-            f"/v1/stores/{store_id}/skuslist",
-            "POST",
-            json=payload,
-            cache_time=MINUTE * 5
-        )
-        return [models.BaseSku(**sku) for sku in result]
+        async with self._skus_chunk_semaphore:
+            if self._request_limiter is not None:
+                await self._request_limiter()
+            return await self.request(
+                f"/v1/stores/{store_id}/skuslist",
+                "POST",
+                json=payload,
+            )
 
     async def get_sku(self, store_id: str, code: str) -> models.BaseSku:
         """
@@ -186,7 +318,9 @@ class LentaClient:
             "GET",
             cache_time=MINUTE * 5,
         )
-        return models.BaseSku(**result)
+        sku = models.BaseSku(**result)
+        self._observe_skus(store_id, [sku])
+        return sku
 
     async def get_catalog(self, store_id: str) -> models.Catalog:
         """
@@ -195,9 +329,20 @@ class LentaClient:
         :return: Каталог магазина
         """
 
-        result = await self.request(
+        catalog_index = await self.get_catalog_index(store_id)
+        return catalog_index.catalog
+
+    async def get_catalog_index(self, store_id: str) -> CatalogIndex:
+        """
+        Получение индекса каталога для магазина
+        Индекс строится один раз при получении каталога и живёт столько же, сколько каталог
+        :param store_id: Идентификатор магазина
+        :return: Индекс каталога магазина
+        """
+
+        return await self.request_object(
             ApiMethods.GET_CATALOG.format(store_id=store_id),
-            "GET",
+            lambda result: CatalogIndex(models.Catalog(**result)),
             cache_time=HOUR,
+            object_name="catalog_index",
         )
-        return models.Catalog(**result)
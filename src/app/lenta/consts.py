@@ -19,3 +19,5 @@ SECOND = 1
 MINUTE = SECOND * 60
 HOUR = MINUTE * 60
 DAY = HOUR * 24
+
+EARTH_RADIUS_KM = 6371.0
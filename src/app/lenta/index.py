@@ -0,0 +1,139 @@
+import heapq
+import math
+from typing import Optional, Sequence
+
+from . import models
+from .utils import haversine_distance
+
+
+class CatalogIndex:
+    """Индекс каталога магазина для поиска групп, категорий и подкатегорий по коду"""
+
+    def __init__(self, catalog: models.Catalog):
+        self.catalog = catalog
+        self._groups: dict[str, models.RootCategory] = {}
+        self._categories: dict[str, models.Category] = {}
+        self._subcategories: dict[str, models.ChildCategory] = {}
+        self._parents: dict[str, models.DetailCategory] = {}
+
+        for group in catalog.catalog_groups:
+            self._groups[group.code] = group
+            for category in group.categories:
+                self._categories[category.code] = category
+                self._parents[category.code] = group
+                for subcategory in category.subcategories:
+                    self._subcategories[subcategory.code] = subcategory
+                    self._parents[subcategory.code] = category
+
+    @property
+    def groups(self) -> Sequence[models.RootCategory]:
+        """Группы каталога"""
+        return self.catalog.catalog_groups
+
+    def get_group(self, code: str) -> Optional[models.RootCategory]:
+        """Получение группы по коду"""
+        return self._groups.get(code)
+
+    def get_category(self, code: str) -> Optional[models.Category]:
+        """Получение категории по коду"""
+        return self._categories.get(code)
+
+    def get_subcategory(self, code: str) -> Optional[models.ChildCategory]:
+        """Получение подкатегории по коду"""
+        return self._subcategories.get(code)
+
+    def get_parent(self, code: str) -> Optional[models.DetailCategory]:
+        """
+        Получение родителя категории или подкатегории
+        :param code: Код категории или подкатегории
+        :return: Группа для категории, категория для подкатегории
+        """
+        return self._parents.get(code)
+
+
+Point = tuple[float, float, float]
+
+
+def _to_unit_vector(lat: float, long: float) -> Point:
+    """Перевод координат в точку на единичной сфере"""
+    phi, lambda_ = math.radians(lat), math.radians(long)
+    return math.cos(phi) * math.cos(lambda_), math.cos(phi) * math.sin(lambda_), math.sin(phi)
+
+
+def _squared_distance(a: Point, b: Point) -> float:
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2
+
+
+class _KdNode:
+    __slots__ = ("point", "store", "axis", "left", "right")
+
+    def __init__(self, point: Point, store: models.Store, axis: int,
+                 left: Optional["_KdNode"], right: Optional["_KdNode"]):
+        self.point = point
+        self.store = store
+        self.axis = axis
+        self.left = left
+        self.right = right
+
+
+class StoreIndex:
+    """
+    Пространственный индекс магазинов для поиска ближайших к точке
+    Магазины хранятся в k-d дереве по координатам на единичной сфере:
+    расстояние по хорде монотонно расстоянию по поверхности, поэтому порядок
+    соседей совпадает с порядком по формуле гаверсинусов
+    """
+
+    def __init__(self, stores: Sequence[models.Store]):
+        self.stores = tuple(stores)
+        points = [(_to_unit_vector(store.lat, store.long), store) for store in self.stores]
+        self._root = self._build(points, 0)
+
+    @classmethod
+    def _build(cls, points: list[tuple[Point, models.Store]], depth: int) -> Optional[_KdNode]:
+        if not points:
+            return None
+        axis = depth % 3
+        points.sort(key=lambda item: item[0][axis])
+        median = len(points) // 2
+        point, store = points[median]
+        return _KdNode(
+            point, store, axis,
+            cls._build(points[:median], depth + 1),
+            cls._build(points[median + 1:], depth + 1),
+        )
+
+    def nearest(self, lat: float, long: float, k: int = 1) -> list[tuple[models.Store, float]]:
+        """
+        Поиск ближайших магазинов
+        :param lat: Широта
+        :param long: Долгота
+        :param k: Кол-во магазинов
+        :return: Магазины и расстояния до них в км., от ближайшего к дальнему
+        """
+        target = _to_unit_vector(lat, long)
+        # Куча из k лучших кандидатов, на вершине самый дальний
+        best: list[tuple[float, int, models.Store]] = []
+        # Узлы для обхода с нижней оценкой расстояния до точек их поддерева
+        stack: list[tuple[_KdNode, float]] = [(self._root, 0.0)] if self._root else []
+        while stack:
+            node, bound = stack.pop()
+            if len(best) == k and bound >= -best[0][0]:
+                continue
+
+            distance = _squared_distance(target, node.point)
+            if len(best) < k:
+                heapq.heappush(best, (-distance, id(node), node.store))
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, id(node), node.store))
+
+            diff = target[node.axis] - node.point[node.axis]
+            near, far = (node.left, node.right) if diff < 0 else (node.right, node.left)
+            # Ближнее поддерево обходим первым, дальнее - только если в нём может быть кандидат ближе
+            if far is not None:
+                stack.append((far, max(bound, diff ** 2)))
+            if near is not None:
+                stack.append((near, bound))
+
+        stores = [store for _, _, store in sorted(best, key=lambda item: -item[0])]
+        return [(store, haversine_distance(lat, long, store.lat, store.long)) for store in stores]
@@ -1,7 +1,14 @@
 from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel as PydanticBaseModel, Field, HttpUrl
+
+
+class BaseModel(PydanticBaseModel):
+    """Базовая модель, экземпляры неизменяемы и могут разделяться через кэш"""
+
+    class Config:
+        allow_mutation = False
 
 
 class City(BaseModel):
@@ -71,11 +78,11 @@ class ChildCategory(DetailCategory):
 
 
 class Category(DetailCategory):
-    subcategories: list[ChildCategory]
+    subcategories: tuple[ChildCategory, ...]
 
 
 class RootCategory(DetailCategory):
-    categories: list[Category]
+    categories: tuple[Category, ...]
 
 
 class LentochkaPromotion(BaseModel):
@@ -84,7 +91,7 @@ class LentochkaPromotion(BaseModel):
 
 
 class Catalog(BaseModel):
-    catalog_groups: list[RootCategory] = Field(alias="catalogGroups")
+    catalog_groups: tuple[RootCategory, ...] = Field(alias="catalogGroups")
     lentochka_promotion: LentochkaPromotion = Field(alias="lentochkaPromotion")
 
 
@@ -1,4 +1,6 @@
-from .consts import SKU_STOCK_TRANSLATE
+import math
+
+from .consts import SKU_STOCK_TRANSLATE, EARTH_RADIUS_KM
 
 
 def translate_sku_stock(en_stock: str) -> str:
@@ -20,3 +22,15 @@ def parse_weight_from_barcode(barcode: str) -> float:
     raw_weight = barcode[-4:-1]
     weight = float(raw_weight) / 1000
     return round(weight, 3)
+
+
+def haversine_distance(lat1: float, long1: float, lat2: float, long2: float) -> float:
+    """
+    Расстояние между двумя точками на поверхности Земли
+    :return: Расстояние в км.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(long2 - long1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
@@ -1,6 +1,9 @@
+import socket
 from typing import Optional, Any, Dict
 
-from pydantic import BaseSettings, PostgresDsn, validator
+from pydantic import BaseSettings, Field, PostgresDsn, validator
+
+from lenta.cache.codecs import check_codec, check_compression
 
 COMMANDS = [
     ("/start", "Регистрация заново")
@@ -20,7 +23,41 @@ class Config(BaseSettings):
     INFLUXDB_DB: str
     INFLUXDB_USER: str
     INFLUXDB_USER_PASSWORD: str
+    INFLUXDB_BATCH_SIZE: int = 500
+    INFLUXDB_FLUSH_INTERVAL: float = 5.0
+    INFLUXDB_MAX_BUFFER: int = 10000
+    ANALYTICS_PAYLOAD_MODE: str = "projection"
+    ANALYTICS_PAYLOAD_SAMPLE_RATE: float = 0.0
     PG_CONNECTION_STRING: Optional[PostgresDsn] = None
+    PG_POOL_MIN_SIZE: int = 2
+    PG_POOL_MAX_SIZE: int = 10
+    PG_STATEMENT_CACHE_SIZE: int = 100
+    PG_MAX_CACHED_STATEMENT_LIFETIME: int = 300
+    PG_MAX_INACTIVE_CONNECTION_LIFETIME: float = 300.0
+    PG_LAZY_CONNECTIONS: bool = True
+    LENTA_MAX_CONCURRENCY: int = 10
+    LENTA_RATE_LIMIT: float = 5.0
+    LENTA_STORE_TIMEOUT: float = 60.0
+    LENTA_SKUS_CHUNK_SIZE: int = 100
+    LENTA_SKUS_CHUNK_CONCURRENCY: int = 4
+    LENTA_CACHE_STALE_RATIO: float = 0.2
+    LENTA_CACHE_MAX_ENTRIES: int = 10000
+    LENTA_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    LENTA_CACHE_POLICY: str = "lru"
+    LENTA_CACHE_CODEC: str = "json"
+    LENTA_CACHE_COMPRESSION: str = "none"
+    LENTA_CACHE_COMPRESS_THRESHOLD: int = 1024
+    LENTA_CACHE_L1_TTL: int = 60
+    LENTA_CACHE_L1_MAX_ENTRIES: int = 1000
+    LENTA_OBJECT_CACHE_MAX_ENTRIES: int = 2000
+    USER_CACHE_MAX_ENTRIES: int = 50000
+    USER_CACHE_TTL: int = 3600
+    USER_CACHE_L1_TTL: int = 60
+    TG_BROADCAST_WORKERS: int = 8
+    TG_BROADCAST_RATE: float = 25.0
+    BOT_INSTANCE_ID: str = Field(default_factory=socket.gethostname)
+    DISCOUNT_JOB_LEASE_SECONDS: int = 600
+    PRICE_HISTORY_FLUSH_INTERVAL: float = 30.0
 
     @validator("PG_CONNECTION_STRING", pre=True)
     def build_db_connection_string(cls, v: Optional[str], values: Dict[str, Any]) -> Any:
@@ -32,6 +69,15 @@ class Config(BaseSettings):
             path=f"/{values.get('PG_DB') or ''}",
         )
 
+    @validator("LENTA_CACHE_CODEC")
+    def check_cache_codec(cls, v: str) -> str:
+        # Недоступный кодек обнаруживается при запуске, а не при первом обращении к кэшу
+        return check_codec(v)
+
+    @validator("LENTA_CACHE_COMPRESSION")
+    def check_cache_compression(cls, v: str) -> str:
+        return check_compression(v)
+
 
 def load_config() -> Config:
     """Загрузка конфигурации из переменных окружения"""
@@ -1,23 +1,35 @@
-import asyncpg
+from typing import Optional
+
 from aiogram.dispatcher.middlewares import LifetimeControllerMiddleware
 
+from tgbot.services.pool import LazyConnection, MeteredPool
 from tgbot.services.repository import Repo
+from tgbot.services.user_cache import UserCache
 
 
 class DbMiddleware(LifetimeControllerMiddleware):
     skip_patterns = ["error", "update"]
 
-    def __init__(self, pool: asyncpg.Pool):
+    def __init__(self, pool: MeteredPool, lazy: bool = True, user_cache: Optional[UserCache] = None):
+        """
+        :param pool: Пул соединений со статистикой использования
+        :param lazy: Брать соединение из пула только при первом обращении обработчика к БД
+        :param user_cache: Кэш данных пользователей
+        """
         super().__init__()
         self.pool = pool
+        self.lazy = lazy
+        self.user_cache = user_cache
 
     async def pre_process(self, obj, data, *args):
-        db = await self.pool.acquire()
-        data["dp"] = db
-        data["repo"] = Repo(db)
+        db = LazyConnection(self.pool)
+        if not self.lazy:
+            await db.get()
+        data["db"] = db
+        data["repo"] = Repo(db, self.user_cache)
 
     async def post_process(self, obj, data, *args):
         del data["repo"]
-        db = data.get("dp")
+        db = data.pop("db", None)
         if db:
-            await db.close()
+            await db.release()
@@ -1,10 +1,17 @@
+import time
+from contextvars import ContextVar
 from datetime import datetime
+from typing import Optional
 
 from aiogram import types
+from aiogram.dispatcher.handler import current_handler
 from aiogram.dispatcher.middlewares import BaseMiddleware
 
 from analytics.client import AnaliyticsClient
 
+# Данные обрабатываемого события, собираются от получения update до окончания его обработки
+current_event: ContextVar[Optional[dict]] = ContextVar("current_event", default=None)
+
 
 class LoggerMiddleware(BaseMiddleware):
     skip_patterns = ["error"]
@@ -43,6 +50,13 @@ class LoggerMiddleware(BaseMiddleware):
         elif update.edited_message:
             return update.edited_message
 
+    @classmethod
+    def _get_callback_prefix(cls, update: types.Update) -> Optional[str]:
+        """Получение префикса данных нажатой кнопки"""
+        if update.callback_query and update.callback_query.data:
+            return update.callback_query.data.split(":", 1)[0]
+        return None
+
     # noinspection PyMethodMayBeStatic
     async def on_pre_process_update(self, update: types.Update, data, *args) -> None:
         if not update.message and not update.callback_query:
@@ -54,9 +68,36 @@ class LoggerMiddleware(BaseMiddleware):
         message = self._get_message_from_update(update)
         message_data = message.date if message else datetime.utcnow()
 
-        await self._client.log(
-            update_type, update_value,
-            message_data,
-            update.to_python(),
-            user_id
-        )
+        current_event.set({
+            "update_type": update_type,
+            "value": update_value,
+            "event_datetime": message_data,
+            "user_id": user_id,
+            "chat_id": message.chat.id if message else None,
+            "callback_prefix": self._get_callback_prefix(update),
+            "update": update.to_python() if self._client.wants_payload() else None,
+            "started_at": time.monotonic(),
+        })
+
+    async def on_process_message(self, message: types.Message, data: dict) -> None:
+        self._register_handler()
+
+    async def on_process_callback_query(self, callback_query: types.CallbackQuery, data: dict) -> None:
+        self._register_handler()
+
+    @classmethod
+    def _register_handler(cls) -> None:
+        """Сохранение названия обработчика, выбранного для события"""
+        event = current_event.get()
+        handler = current_handler.get(None)
+        if event is not None and handler is not None:
+            event["handler"] = getattr(handler, "__name__", str(handler))
+
+    async def on_post_process_update(self, update: types.Update, results, data: dict) -> None:
+        event = current_event.get()
+        if event is None:
+            return
+        current_event.set(None)
+
+        started_at = event.pop("started_at")
+        self._client.log(latency=time.monotonic() - started_at, **event)
@@ -1 +1 @@
-from . import lenta, messages, profile, repository, utils, store, sku
+from . import lenta, messages, profile, repository, store, sku
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+from typing import Iterable, NamedTuple, Optional
+
+from aiogram import Bot
+from aiogram.utils.exceptions import (
+    BotBlocked,
+    ChatNotFound,
+    NetworkError,
+    RetryAfter,
+    TelegramAPIError,
+    UserDeactivated,
+)
+
+from tgbot.services.limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = 25.0  # Ограничение Telegram ~30 сообщений в секунду, оставляем запас
+CHAT_INTERVAL = 1.0  # Не чаще одного сообщения в секунду в один чат
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class DeliveryStatus:
+    DELIVERED = "delivered"
+    BLOCKED = "blocked"
+    FAILED = "failed"
+
+
+class DeliveryResult(NamedTuple):
+    """Результат доставки сообщения пользователю"""
+    user_id: int
+    status: str
+    attempts: int
+    error: Optional[str] = None
+
+
+class DeliveryReport:
+    """Отчёт о рассылке"""
+
+    def __init__(self):
+        self.results: list[DeliveryResult] = []
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    def add(self, result: DeliveryResult) -> None:
+        self.results.append(result)
+
+    def finish(self) -> None:
+        self.finished_at = time.monotonic()
+
+    def count(self, status: str) -> int:
+        """Кол-во результатов с указанным статусом"""
+        return sum(1 for result in self.results if result.status == status)
+
+    @property
+    def duration(self) -> float:
+        """Длительность рассылки в секундах"""
+        finished_at = self.finished_at if self.finished_at is not None else time.monotonic()
+        return finished_at - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Кол-во отправленных сообщений в секунду"""
+        duration = self.duration
+        return len(self.results) / duration if duration else 0.0
+
+    def __str__(self):
+        return (
+            f"Broadcast: total={len(self.results)} delivered={self.count(DeliveryStatus.DELIVERED)} "
+            f"blocked={self.count(DeliveryStatus.BLOCKED)} failed={self.count(DeliveryStatus.FAILED)} "
+            f"duration={self.duration:.1f}s throughput={self.throughput:.1f} msg/s"
+        )
+
+
+class Broadcaster:
+    """
+    Рассылка сообщений пулом обработчиков с учётом ограничений Telegram
+    Сообщения добавляются через submit, после завершения вызывается close
+    """
+
+    def __init__(
+            self,
+            bot: Bot,
+            workers: int = DEFAULT_WORKERS,
+            global_rate: float = GLOBAL_RATE,
+            chat_interval: float = CHAT_INTERVAL,
+            max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        self._bot = bot
+        self._workers_count = workers
+        self._global_limiter = TokenBucket(global_rate)
+        self._chat_interval = chat_interval
+        self._max_attempts = max_attempts
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        self._workers: list[asyncio.Task] = []
+        self._chat_next_send_at: dict[int, float] = {}
+        self._resume_at = 0.0  # Время окончания глобальной паузы после flood wait
+        self.report = DeliveryReport()
+
+    async def start(self) -> None:
+        """Запуск обработчиков"""
+        self.report = DeliveryReport()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self._workers_count)]
+
+    async def submit(self, user_id: int, text: str) -> "asyncio.Future[DeliveryResult]":
+        """
+        Добавление сообщения в очередь, ожидает при заполненной очереди
+        :return: Future с результатом доставки сообщения
+        """
+        future = asyncio.get_event_loop().create_future()
+        await self._queue.put((user_id, text, future))
+        return future
+
+    async def close(self) -> DeliveryReport:
+        """Ожидание отправки всех сообщений и остановка обработчиков"""
+        await self._queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self.report.finish()
+        return self.report
+
+    async def broadcast(self, messages: Iterable[tuple[int, str]]) -> DeliveryReport:
+        """Рассылка готового списка сообщений"""
+        await self.start()
+        for user_id, text in messages:
+            await self.submit(user_id, text)
+        return await self.close()
+
+    async def _worker(self) -> None:
+        while True:
+            user_id, text, future = await self._queue.get()
+            try:
+                result = await self._deliver(user_id, text)
+            except Exception as e:
+                result = DeliveryResult(user_id, DeliveryStatus.FAILED, 0, repr(e))
+            try:
+                self.report.add(result)
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    async def _wait_turn(self, user_id: int) -> None:
+        """Ожидание возможности отправить сообщение в чат"""
+        delay = max(self._resume_at, self._chat_next_send_at.get(user_id, 0.0)) - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self._global_limiter.acquire()
+        self._chat_next_send_at[user_id] = time.monotonic() + self._chat_interval
+
+    async def _deliver(self, user_id: int, text: str) -> DeliveryResult:
+        """Отправка сообщения с повторами при flood wait и сетевых ошибках"""
+        error: Optional[str] = None
+        for attempt in range(1, self._max_attempts + 1):
+            await self._wait_turn(user_id)
+            try:
+                await self._bot.send_message(user_id, text)
+                return DeliveryResult(user_id, DeliveryStatus.DELIVERED, attempt)
+            except RetryAfter as e:
+                # Flood wait относится ко всему боту, приостанавливаем все обработчики
+                logger.warning("Flood wait %s seconds on user %s", e.timeout, user_id)
+                self._resume_at = max(self._resume_at, time.monotonic() + e.timeout)
+                error = str(e)
+            except (BotBlocked, ChatNotFound, UserDeactivated) as e:
+                return DeliveryResult(user_id, DeliveryStatus.BLOCKED, attempt, str(e))
+            except NetworkError as e:
+                error = str(e)
+            except TelegramAPIError as e:
+                return DeliveryResult(user_id, DeliveryStatus.FAILED, attempt, str(e))
+        return DeliveryResult(user_id, DeliveryStatus.FAILED, self._max_attempts, error)
@@ -0,0 +1,226 @@
+import asyncio
+import datetime
+import logging
+import uuid
+from collections import defaultdict
+from typing import Optional
+
+from aiogram import Bot
+
+from lenta.client import LentaClient
+from tgbot.services.broadcast import Broadcaster, DEFAULT_WORKERS, GLOBAL_RATE
+from tgbot.services.lenta import (
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_STORE_TIMEOUT,
+    StorePartition,
+    detect_sku_changes,
+    fetch_store_skus,
+    get_changes_message,
+    get_user_changes,
+)
+from tgbot.services.pool import MeteredPool
+from tgbot.services.repository import Repo
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 600  # Время аренды части рассылки одним обработчиком
+DEFAULT_MAX_ATTEMPTS = 3  # Максимальное кол-во попыток обработки части рассылки
+DELIVERY_BATCH_SIZE = 100  # Кол-во результатов отправки, сохраняемых за раз
+POLL_INTERVAL = 30  # Пауза между попытками захвата частей, арендованных другими обработчиками, в секундах
+
+
+class PartitionStatus:
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class DiscountJobRunner:
+    """
+    Ночная рассылка скидок, разбитая на части по магазинам
+    Состояние частей и отправленных уведомлений хранится в Postgres, поэтому
+    после перезапуска рассылка продолжается с места остановки, а части
+    распределяются между несколькими экземплярами бота через аренду
+    """
+
+    def __init__(
+            self,
+            pool: MeteredPool,
+            lenta_client: LentaClient,
+            bot: Bot,
+            worker_id: str,
+            max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+            store_timeout: float = DEFAULT_STORE_TIMEOUT,
+            broadcast_workers: int = DEFAULT_WORKERS,
+            broadcast_rate: float = GLOBAL_RATE,
+            lease_seconds: int = DEFAULT_LEASE_SECONDS,
+            max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        """
+        :param pool: Пул соединений
+        :param lenta_client: Клиент API Lenta.com
+        :param bot: Бот для отправки уведомлений
+        :param worker_id: Идентификатор экземпляра бота, с него начинается владелец каждой аренды
+        :param max_concurrency: Кол-во одновременно обрабатываемых магазинов
+        :param store_timeout: Время ожидания ответа по одному магазину в секундах
+        :param broadcast_workers: Кол-во обработчиков рассылки
+        :param broadcast_rate: Максимальное кол-во сообщений в секунду
+        :param lease_seconds: Время аренды части рассылки в секундах
+        :param max_attempts: Максимальное кол-во попыток обработки части
+        """
+        self._pool = pool
+        self._lenta_client = lenta_client
+        self._bot = bot
+        self._worker_id = worker_id
+        self._max_concurrency = max_concurrency
+        self._store_timeout = store_timeout
+        self._broadcast_workers = broadcast_workers
+        self._broadcast_rate = broadcast_rate
+        self._lease_seconds = lease_seconds
+        self._max_attempts = max_attempts
+        # Владельцы аренды частей, обрабатываемых этим процессом
+        self._leases: set[str] = set()
+
+    async def run(self, run_date: Optional[datetime.date] = None) -> None:
+        """
+        Запуск рассылки за дату
+        :param run_date: Дата рассылки, по умолчанию текущая
+        """
+        run_date = run_date or datetime.date.today()
+        async with self._pool.acquire() as conn:
+            await Repo(conn).create_job_partitions(run_date)
+        await self._process(run_date)
+
+    async def resume(self) -> None:
+        """Продолжение незавершённых рассылок за последние сутки"""
+        since = datetime.date.today() - datetime.timedelta(days=1)
+        async with self._pool.acquire() as conn:
+            run_dates = await Repo(conn).get_unfinished_job_dates(since)
+        for run_date in run_dates:
+            logger.info("Resuming discount job for %s", run_date)
+            await self._process(run_date)
+
+    async def _process(self, run_date: datetime.date) -> None:
+        """Обработка частей рассылки, пока есть свободные"""
+        broadcaster = Broadcaster(self._bot, workers=self._broadcast_workers, global_rate=self._broadcast_rate)
+        await broadcaster.start()
+        try:
+            await asyncio.gather(*[
+                self._partition_worker(run_date, broadcaster) for _ in range(self._max_concurrency)
+            ])
+        finally:
+            report = await broadcaster.close()
+        logger.info("Discount job %s on %s: %s", run_date, self._worker_id, report)
+
+    async def _partition_worker(self, run_date: datetime.date, broadcaster: Broadcaster) -> None:
+        while True:
+            # Владелец аренды уникален для каждого захвата, чтобы отличать свою аренду от перехваченной
+            # и от аренды другого экземпляра с тем же идентификатором
+            lease_owner = f"{self._worker_id}:{uuid.uuid4().hex}"
+            async with self._pool.acquire() as conn:
+                repo = Repo(conn)
+                partition = await repo.claim_job_partition(
+                    run_date, lease_owner, self._lease_seconds, self._max_attempts,
+                )
+                has_active = partition is not None
+                if not has_active:
+                    failed_store_ids = await repo.fail_exhausted_job_partitions(run_date, self._max_attempts)
+                    if failed_store_ids:
+                        logger.error("Discount job %s partitions exhausted attempts: %s", run_date, failed_store_ids)
+                    has_active = await repo.has_active_job_partitions(run_date, self._max_attempts)
+            if not has_active:
+                return
+            if partition is None:
+                # Остальные части арендованы, ждём их завершения или истечения аренды
+                await asyncio.sleep(POLL_INTERVAL)
+                continue
+
+            store_id = partition["store_id"]
+            self._leases.add(lease_owner)
+            try:
+                try:
+                    status = await self._process_partition(run_date, store_id, lease_owner, broadcaster)
+                except Exception as e:
+                    logger.error("Discount job partition %s failed: %r", store_id, e)
+                    status = PartitionStatus.FAILED
+
+                # Неудачную часть возвращаем в очередь, пока не исчерпаны попытки
+                if status == PartitionStatus.FAILED and partition["attempts"] < self._max_attempts:
+                    status = PartitionStatus.PENDING
+                async with self._pool.acquire() as conn:
+                    await Repo(conn).finish_job_partition(run_date, store_id, lease_owner, status)
+            finally:
+                self._leases.discard(lease_owner)
+
+    async def close(self) -> None:
+        """
+        Возврат в очередь частей, которые обрабатывает этот процесс
+        Вызывается при остановке бота, чтобы части сразу подхватил другой экземпляр
+        или следующий запуск, а не ждал истечения аренды
+        """
+        if not self._leases:
+            return
+        async with self._pool.acquire() as conn:
+            released = await Repo(conn).release_job_partitions(list(self._leases))
+        self._leases.clear()
+        logger.info("Released %s discount job partitions on shutdown", released)
+
+    async def _process_partition(self, run_date: datetime.date, store_id: str, lease_owner: str,
+                                 broadcaster: Broadcaster) -> str:
+        """
+        Обработка части рассылки по одному магазину
+        :return: Статус обработки части
+        """
+        async with self._pool.acquire() as conn:
+            repo = Repo(conn)
+            partition = await self._load_partition(repo, store_id)
+            delivered_user_ids = await repo.get_delivered_user_ids(run_date, list(partition.user_skus))
+            snapshots = await repo.get_sku_snapshots(store_id, partition.sku_ids)
+
+        result = await fetch_store_skus(
+            self._lenta_client, store_id, partition.sku_ids, self._store_timeout,
+        )
+        if not result.is_success:
+            return PartitionStatus.FAILED
+
+        # Уведомляем только пользователей, у товаров которых изменилось состояние скидки
+        changes = detect_sku_changes(result.skus, snapshots, run_date)
+        futures = []
+        for user_id, sku_ids in partition.user_skus.items():
+            user_changes = get_user_changes(changes, sku_ids)
+            if not user_changes or user_id in delivered_user_ids:
+                continue
+            futures.append(await broadcaster.submit(user_id, get_changes_message(user_changes)))
+
+        deliveries: list[tuple[int, str]] = []
+        for future in asyncio.as_completed(futures):
+            delivery = await future
+            deliveries.append((delivery.user_id, delivery.status))
+            if len(deliveries) >= DELIVERY_BATCH_SIZE:
+                await self._save_deliveries(run_date, store_id, lease_owner, deliveries)
+                deliveries = []
+        await self._save_deliveries(run_date, store_id, lease_owner, deliveries)
+
+        # Состояния сохраняются после рассылки, чтобы при повторной обработке части изменения совпали
+        async with self._pool.acquire() as conn:
+            await Repo(conn).save_sku_snapshots(store_id, result.skus)
+        return PartitionStatus.DONE
+
+    @classmethod
+    async def _load_partition(cls, repo: Repo, store_id: str) -> StorePartition:
+        """Получение товаров пользователей магазина"""
+        user_skus: dict[int, list[str]] = defaultdict(list)
+        async for row in repo.iter_store_user_skus(store_id):
+            user_skus[row["user_id"]].append(row["sku_id"])
+        return StorePartition(store_id, dict(user_skus))
+
+    async def _save_deliveries(self, run_date: datetime.date, store_id: str, lease_owner: str,
+                               deliveries: list[tuple[int, str]]) -> None:
+        """Сохранение результатов отправки и продление аренды части"""
+        async with self._pool.acquire() as conn:
+            repo = Repo(conn)
+            if deliveries:
+                await repo.add_job_deliveries(run_date, deliveries)
+            if not await repo.extend_job_partition_lease(run_date, store_id, lease_owner, self._lease_seconds):
+                logger.warning("Lease for discount job partition %s was lost", store_id)
@@ -1,98 +1,142 @@
+import asyncio
 import datetime
 import logging
-from collections import defaultdict
 from typing import Optional, NamedTuple
 
 import asyncpg
-from aiogram import Bot
 
 from lenta.client import LentaClient
 from lenta.models import BaseSku
 from tgbot.services.messages import get_sku_info_message
-from tgbot.services.repository import Repo
 
+logger = logging.getLogger(__name__)
 
-class UserInfo(NamedTuple):
-    user_id: int
-    store_id: str
-
-
-async def get_discounts_for_skus(pool: asyncpg.Pool, lenta_client: LentaClient, bot: Bot) -> None:
-    """Получение сегодняшних скидок по товарам в магазинах"""
-    async with pool.acquire() as conn:
-        repo = Repo(conn)
-        now = datetime.datetime.now()
-        sku_data = await _get_sku_data(repo, lenta_client)
-        user_store_skus = await _get_user_store_skus_data(repo)
-
-        user_discount_skus = _get_user_skus_with_discount(sku_data, user_store_skus)
-        await send_messages(bot, user_discount_skus)
-
-
-async def _get_sku_data(repo: Repo, lenta_client: LentaClient) -> dict[str, dict[str, Optional[BaseSku]]]:
-    """Получение информации о продуктах"""
-    store_skus = await repo.get_store_skus()
-
-    # Собираем информацию о магазинах и продуктах в них
-    store_sku_id_to_sku = _prepare_store_skus_data(store_skus)
-    # Для каждого из магазинов получим связанный с ним список товаров
-    # из API Lenta.com
-    for store_id in store_sku_id_to_sku.keys():
-        sku_ids = list(store_sku_id_to_sku[store_id].keys())
-        sku_data = await lenta_client.get_store_skus_by_ids(store_id, sku_ids)
-        for sku in sku_data:
-            store_sku_id_to_sku[store_id][sku.code] = sku
-    return store_sku_id_to_sku
-
-
-def _prepare_store_skus_data(store_skus: list[asyncpg.Record]) -> dict[str, dict[str, Optional[BaseSku]]]:
-    store_sku_id_to_sku: dict[str, dict[str, Optional[BaseSku]]] = defaultdict(dict)
-
-    for item in store_skus:
-        store_sku_id_to_sku[item.get("store_id")][item.get("sku_id")] = None
-    return store_sku_id_to_sku
+DEFAULT_MAX_CONCURRENCY = 10  # Максимальное кол-во одновременно обрабатываемых магазинов
+DEFAULT_STORE_TIMEOUT = 60.0  # Время ожидания ответа по одному магазину в секундах
 
 
-async def _get_user_store_skus_data(repo: Repo) -> dict[UserInfo, list]:
-    """Преобразование данных о пользовательских магазинах и товаров"""
-    user_store_skus = await repo.get_user_store_skus()
-    return _prepare_user_store_skus_data(user_store_skus)
-
-
-def _prepare_user_store_skus_data(user_store_skus: list[asyncpg.Record]) -> dict[UserInfo, list]:
-    user_store_ids: dict[UserInfo, list] = defaultdict(list)
-    for item in user_store_skus:
-        user_store_id = UserInfo(item.get("user_id"), item.get("store_id"))
-        user_store_ids[user_store_id].append(item.get("sku_id"))
-    return user_store_ids
-
-
-def _get_user_skus_with_discount(sku_data: dict[str, dict[str, Optional[BaseSku]]],
-                                 user_store_skus: dict[UserInfo, list]) -> list[tuple[int, list[BaseSku]]]:
-    user_skus: list[tuple[int, list[BaseSku]]] = []
-
-    for user_store_id, sku_ids in user_store_skus.items():
-        user_id, store_id = user_store_id.user_id, user_store_id.store_id
-
-        sku_details = []
-        for sku_id in sku_ids:
-            sku = sku_data[store_id][sku_id]
-            if sku.promo_type != "None":
-                sku_details.append(sku)
-
-        user_skus.append((user_id, sku_details))
+class StorePartition(NamedTuple):
+    """Товары пользователей одного магазина"""
+    store_id: str
+    user_skus: dict[int, list[str]]
 
-    return user_skus
+    @property
+    def sku_ids(self) -> list[str]:
+        """Уникальные идентификаторы товаров магазина"""
+        return list(dict.fromkeys(sku_id for sku_ids in self.user_skus.values() for sku_id in sku_ids))
 
 
-async def send_messages(bot: Bot, user_skus: list[tuple[int, list[BaseSku]]]) -> None:
-    """Рассылка сообщений о скидках"""
-    for user_id, skus in user_skus:
-        try:
-            message = "\n\n".join([
-                "🎁 Скидки на сегодня" if skus else "😢 На ваши товары сегодня скидок нет",
-                *[get_sku_info_message(sku) for sku in skus]
-            ])
-            await bot.send_message(user_id, message)
-        except Exception as e:
-            logging.error(e)
+class StoreFetchResult(NamedTuple):
+    """Результат получения товаров магазина"""
+    store_id: str
+    skus: list[BaseSku]
+    error: Optional[Exception] = None
+
+    @property
+    def is_success(self) -> bool:
+        return self.error is None
+
+
+class ChangeType:
+    NEW = "new"  # Появилась скидка
+    CHANGED = "changed"  # Изменилась цена или срок действия скидки
+    ENDING = "ending"  # Последний день скидки
+    ENDED = "ended"  # Скидка закончилась
+
+
+CHANGE_TITLES = {
+    ChangeType.NEW: "🎁 Новые скидки",
+    ChangeType.CHANGED: "🔄 Изменились скидки",
+    ChangeType.ENDING: "⏳ Последний день скидки",
+    ChangeType.ENDED: "🔚 Закончились скидки",
+}
+
+
+class SkuChange(NamedTuple):
+    """Изменение скидки на товар"""
+    sku: BaseSku
+    change_type: str
+
+
+async def fetch_store_skus(
+        lenta_client: LentaClient,
+        store_id: str,
+        sku_ids: list[str],
+        store_timeout: float = DEFAULT_STORE_TIMEOUT,
+) -> StoreFetchResult:
+    """
+    Получение товаров магазина с ограничением времени ожидания
+    Частота запросов к API ограничивается в клиенте для каждой части списка товаров
+    :param lenta_client: Клиент API Lenta.com
+    :param store_id: Идентификатор магазина
+    :param sku_ids: Идентификаторы товаров
+    :param store_timeout: Время ожидания ответа в секундах
+    :return: Результат получения товаров
+    """
+    try:
+        # Рассылка сравнивает цены на начало дня, поэтому кэш товаров не читается
+        skus = await asyncio.wait_for(
+            lenta_client.get_store_skus_by_ids(store_id, sku_ids, use_cache=False), store_timeout,
+        )
+    except Exception as e:
+        logger.warning("Failed to fetch skus for store %s: %r", store_id, e)
+        return StoreFetchResult(store_id, [], e)
+    return StoreFetchResult(store_id, skus)
+
+
+def has_promo(sku: BaseSku) -> bool:
+    """Проверка, что на товар действует скидка"""
+    return sku.promo_type != "None"
+
+
+def get_end_date(sku: BaseSku) -> Optional[datetime.date]:
+    """Получение даты окончания скидки"""
+    return sku.validity_end_date.date() if sku.validity_end_date else None
+
+
+def detect_sku_changes(
+        skus: list[BaseSku],
+        snapshots: dict[str, asyncpg.Record],
+        today: datetime.date,
+) -> dict[str, SkuChange]:
+    """
+    Сравнение текущих скидок с сохранёнными при прошлой рассылке
+    :param skus: Текущие товары магазина
+    :param snapshots: Сохранённые состояния товаров по идентификатору
+    :param today: Дата рассылки
+    :return: Изменения скидок по идентификатору товара
+    """
+    changes: dict[str, SkuChange] = {}
+    for sku in skus:
+        snapshot = snapshots.get(sku.code)
+        if not has_promo(sku):
+            # Скидка была при прошлой рассылке, а сейчас её нет
+            if snapshot is not None and snapshot["promo_id"] is not None:
+                changes[sku.code] = SkuChange(sku, ChangeType.ENDED)
+            continue
+
+        end_date = get_end_date(sku)
+        if snapshot is None or snapshot["promo_id"] != sku.promo_id:
+            changes[sku.code] = SkuChange(sku, ChangeType.NEW)
+        elif snapshot["discount_price"] != sku.discount_price or snapshot["validity_end_date"] != end_date:
+            changes[sku.code] = SkuChange(sku, ChangeType.CHANGED)
+        elif end_date == today:
+            # API может отдавать скидку и после даты окончания, о ней сообщается только один раз
+            changes[sku.code] = SkuChange(sku, ChangeType.ENDING)
+    return changes
+
+
+def get_user_changes(changes: dict[str, SkuChange], sku_ids: list[str]) -> list[SkuChange]:
+    """Получение изменений скидок по товарам пользователя"""
+    return [changes[sku_id] for sku_id in sku_ids if sku_id in changes]
+
+
+def get_changes_message(changes: list[SkuChange]) -> str:
+    """Формирование сообщения об изменениях скидок"""
+    msg_parts = []
+    for change_type, title in CHANGE_TITLES.items():
+        skus = [change.sku for change in changes if change.change_type == change_type]
+        if skus:
+            msg_parts.append(title)
+            msg_parts.extend(get_sku_info_message(sku) for sku in skus)
+    return "\n\n".join(msg_parts)
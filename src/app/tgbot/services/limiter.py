@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Ограничитель частоты запросов по алгоритму token bucket"""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        """
+        :param rate: Кол-во токенов, пополняемых в секунду
+        :param capacity: Максимальное кол-во накопленных токенов
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self._rate = rate
+        self._capacity = max(capacity, 1)
+        self._tokens = float(self._capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        """Пополнение токенов за прошедшее время"""
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """Ожидание свободного токена"""
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+                self._refill()
+            self._tokens -= 1
+
+    async def __aenter__(self) -> "TokenBucket":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        return None
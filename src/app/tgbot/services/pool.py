@@ -0,0 +1,115 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Union
+
+import asyncpg
+
+
+class PoolMetrics:
+    """Статистика использования пула соединений"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.acquires = 0
+        self.in_use = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def register_acquire(self, wait_time: float) -> None:
+        self.acquires += 1
+        self.in_use += 1
+        self.total_wait += wait_time
+        self.max_wait = max(self.max_wait, wait_time)
+
+    def register_release(self) -> None:
+        self.in_use -= 1
+
+    @property
+    def avg_wait(self) -> float:
+        """Среднее время ожидания соединения в секундах"""
+        return self.total_wait / self.acquires if self.acquires else 0.0
+
+    @property
+    def utilization(self) -> float:
+        """Доля занятых соединений пула"""
+        return self.in_use / self.max_size if self.max_size else 0.0
+
+    def as_dict(self) -> dict[str, Union[int, float]]:
+        return {
+            "acquires": self.acquires,
+            "in_use": self.in_use,
+            "max_size": self.max_size,
+            "utilization": round(self.utilization, 4),
+            "avg_wait_ms": round(self.avg_wait * 1000, 3),
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+    def __str__(self):
+        return " ".join(f"{key}={value}" for key, value in self.as_dict().items())
+
+
+class MeteredPool:
+    """
+    Пул соединений с учётом каждого получения соединения в статистике
+    Все соединения должны браться через него, иначе загрузка пула занижается
+    """
+
+    def __init__(self, pool: asyncpg.Pool, metrics: PoolMetrics):
+        self.pool = pool
+        self.metrics = metrics
+
+    async def acquire_connection(self) -> asyncpg.Connection:
+        """Получение соединения из пула, его нужно вернуть через release"""
+        started_at = time.monotonic()
+        conn = await self.pool.acquire()
+        self.metrics.register_acquire(time.monotonic() - started_at)
+        return conn
+
+    async def release(self, conn: asyncpg.Connection) -> None:
+        """Возврат соединения в пул"""
+        try:
+            await self.pool.release(conn)
+        finally:
+            self.metrics.register_release()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[asyncpg.Connection]:
+        """Получение соединения на время блока with"""
+        conn = await self.acquire_connection()
+        try:
+            yield conn
+        finally:
+            await self.release(conn)
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+
+class LazyConnection:
+    """Соединение, которое берётся из пула при первом обращении и возвращается в пул"""
+
+    def __init__(self, pool: MeteredPool):
+        self._pool = pool
+        self._conn: Optional[asyncpg.Connection] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_acquired(self) -> bool:
+        return self._conn is not None
+
+    async def get(self) -> asyncpg.Connection:
+        """Получение соединения, при первом вызове соединение берётся из пула"""
+        if self._conn is not None:
+            return self._conn
+        async with self._lock:
+            if self._conn is None:
+                self._conn = await self._pool.acquire_connection()
+        return self._conn
+
+    async def release(self) -> None:
+        """Возврат соединения в пул"""
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        await self._pool.release(conn)
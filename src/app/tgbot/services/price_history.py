@@ -0,0 +1,102 @@
+import asyncio
+import datetime
+import logging
+from typing import Optional
+
+from lenta.models import BaseSku
+from tgbot.services.pool import MeteredPool
+from tgbot.services.repository import Repo
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 30.0  # Период записи накопленных наблюдений в секундах
+DEFAULT_MAX_BUFFER = 5000  # Кол-во наблюдений, при котором запись выполняется сразу
+
+
+class PriceHistoryWriter:
+    """
+    Запись истории цен товаров
+    Наблюдения накапливаются в памяти и пачками добавляются в таблицу через COPY.
+    Цена товара записывается не чаще раза в день, если она не изменилась
+    """
+
+    def __init__(
+            self,
+            pool: MeteredPool,
+            flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+            max_buffer: int = DEFAULT_MAX_BUFFER,
+    ):
+        """
+        :param pool: Пул соединений
+        :param flush_interval: Период записи наблюдений в секундах
+        :param max_buffer: Кол-во наблюдений, при котором запись выполняется сразу
+        """
+        self._pool = pool
+        self._flush_interval = flush_interval
+        self._max_buffer = max_buffer
+        self._buffer: list[tuple] = []
+        # Последние записанные цены за текущий день по магазину и товару
+        self._last_prices: dict[tuple[str, str], tuple[float, Optional[float]]] = {}
+        self._last_prices_date = datetime.date.today()
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_tasks: set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Запуск периодической записи"""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        """Остановка периодической записи и запись оставшихся наблюдений"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await self.flush()
+
+    def observe(self, store_id: str, skus: list[BaseSku]) -> None:
+        """
+        Добавление наблюдения цен товаров магазина
+        :param store_id: Идентификатор магазина
+        :param skus: Полученные товары
+        """
+        now = datetime.datetime.now()
+        if now.date() != self._last_prices_date:
+            self._last_prices.clear()
+            self._last_prices_date = now.date()
+
+        for sku in skus:
+            key = (store_id, sku.code)
+            prices = (sku.regular_price, sku.discount_price)
+            if self._last_prices.get(key) == prices:
+                continue
+            self._last_prices[key] = prices
+            promo_id = sku.promo_id if sku.promo_type != "None" else None
+            self._buffer.append((store_id, sku.code, now, sku.regular_price, sku.discount_price, promo_id))
+
+        if len(self._buffer) >= self._max_buffer and self._flusher is not None:
+            task = asyncio.create_task(self.flush())
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self) -> None:
+        """Запись накопленных наблюдений"""
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            observations, self._buffer = self._buffer, []
+            try:
+                async with self._pool.acquire() as conn:
+                    await Repo(conn).add_price_observations(observations)
+            except Exception as e:
+                logger.error("Failed to write %s price observations: %r", len(observations), e)
+                # Цены не записаны, поэтому при следующем наблюдении их нужно записать заново
+                for store_id, sku_id, *_ in observations:
+                    self._last_prices.pop((store_id, sku_id), None)
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            await self.flush()
@@ -1,81 +1,432 @@
-import logging
-from typing import Optional
+import datetime
+import uuid
+from typing import AsyncIterator, Iterable, Optional, Union
 
 import asyncpg
 
+from lenta.models import BaseSku
+from tgbot.services.pool import LazyConnection
+from tgbot.services.user_cache import UserCache
+
+BULK_COPY_THRESHOLD = 500  # Кол-во строк, начиная с которого запись выполняется через COPY
+
 
 class Repo:
 
-    def __init__(self, conn: asyncpg.Connection):
-        self.conn = conn
+    def __init__(self, conn: Union[asyncpg.Connection, LazyConnection], user_cache: Optional[UserCache] = None):
+        """
+        :param conn: Соединение с БД
+        :param user_cache: Кэш данных пользователей, обновляется при их изменении
+        """
+        self._conn = conn
+        self._user_cache = user_cache
+
+    async def _get_conn(self) -> asyncpg.Connection:
+        """Получение соединения, отложенное соединение берётся из пула при первом запросе"""
+        if isinstance(self._conn, LazyConnection):
+            return await self._conn.get()
+        return self._conn
+
+    async def _bulk_upsert(self, table: str, columns: tuple[str, ...], key_columns: tuple[str, ...],
+                           records: Iterable[tuple], on_conflict: str) -> None:
+        """
+        Запись пачки строк с обработкой конфликтов
+        Небольшие пачки пишутся через executemany, большие копируются через COPY
+        во временную таблицу и переносятся одним запросом в транзакции.
+        Строки с одинаковым ключом схлопываются до последней, как при записи по одной
+        :param table: Таблица
+        :param columns: Записываемые колонки
+        :param key_columns: Колонки ключа конфликта
+        :param records: Строки
+        :param on_conflict: Действие при конфликте, значения берутся из EXCLUDED
+        """
+        key_indexes = [columns.index(column) for column in key_columns]
+        # Один INSERT ... ON CONFLICT не может изменить строку дважды
+        records = list({tuple(record[i] for i in key_indexes): record for record in records}.values())
+        if not records:
+            return
+
+        conn = await self._get_conn()
+        columns_sql = ", ".join(columns)
+        conflict_sql = f"ON CONFLICT ({', '.join(key_columns)}) {on_conflict}"
+        if len(records) < BULK_COPY_THRESHOLD:
+            values_sql = ", ".join(f"${i}" for i in range(1, len(columns) + 1))
+            await conn.executemany(
+                f"INSERT INTO {table} ({columns_sql}) VALUES ({values_sql}) {conflict_sql}",
+                records
+            )
+            return
+
+        # Временная таблица удаляется только при завершении внешней транзакции,
+        # поэтому для каждого вызова в ней нужно отдельное имя
+        temp_table = f"{table}_import_{uuid.uuid4().hex[:12]}"
+        async with conn.transaction():
+            await conn.execute(f"CREATE TEMPORARY TABLE {temp_table} (LIKE {table}) ON COMMIT DROP")
+            await conn.copy_records_to_table(temp_table, records=records, columns=columns)
+            await conn.execute(
+                f"INSERT INTO {table} ({columns_sql}) SELECT {columns_sql} FROM {temp_table} {conflict_sql}"
+            )
 
     async def add_user(self, user_id: int, first_name: str, last_name: str) -> None:
         """Сохранение пользователя"""
-        await self.conn.execute(
+        conn = await self._get_conn()
+        await conn.execute(
             "INSERT INTO users (id, first_name, last_name) VALUES ($1, $2, $3) ON CONFLICT (id) "
             "DO UPDATE SET first_name = $2, last_name = $3",
             user_id, first_name, last_name
         )
         return
 
-    async def set_store_to_user(self, store_id: str, user_id: int):
-        """Добавление магазина пользователю"""
-        await self.conn.execute(
-            "DELETE FROM user_store WHERE user_id=$1",
-            user_id
+    async def add_users(self, users: Iterable[tuple[int, str, str]]) -> None:
+        """
+        Сохранение пачки пользователей
+        :param users: Кортежи (id, first_name, last_name)
+        """
+        await self._bulk_upsert(
+            "users", ("id", "first_name", "last_name"), ("id",), users,
+            "DO UPDATE SET first_name = EXCLUDED.first_name, last_name = EXCLUDED.last_name",
         )
-        await self.conn.execute(
-            "INSERT INTO user_store (user_id, store_id) VALUES ($1, $2) ON CONFLICT DO NOTHING",
+
+    async def set_store_to_user(self, store_id: str, user_id: int):
+        """Добавление магазина пользователю, предыдущий магазин заменяется"""
+        conn = await self._get_conn()
+        await conn.execute(
+            "INSERT INTO user_store (user_id, store_id) VALUES ($1, $2) "
+            "ON CONFLICT (user_id) DO UPDATE SET store_id = EXCLUDED.store_id",
             user_id, store_id
         )
+        if self._user_cache is not None:
+            await self._user_cache.set_store_id(user_id, store_id)
+
+    async def set_stores_to_users(self, user_stores: Iterable[tuple[int, str]]) -> None:
+        """
+        Замена магазинов пачке пользователей
+        :param user_stores: Кортежи (user_id, store_id)
+        """
+        user_stores = list(user_stores)
+        await self._bulk_upsert(
+            "user_store", ("user_id", "store_id"), ("user_id",), user_stores,
+            "DO UPDATE SET store_id = EXCLUDED.store_id",
+        )
+        if self._user_cache is not None:
+            for user_id, _ in user_stores:
+                await self._user_cache.invalidate_store_id(user_id)
 
     async def get_user_store_id(self, user_id: int) -> Optional[str]:
         """Получение магазинов пользователя"""
-        row = await self.conn.fetchrow(
+        if self._user_cache is not None:
+            store_id = await self._user_cache.get_store_id(user_id)
+            if store_id is not None:
+                return store_id
+
+        conn = await self._get_conn()
+        row = await conn.fetchrow(
             "SELECT user_id, store_id FROM user_store WHERE user_id=$1",
             user_id
         )
-        return None if not row else row["store_id"]
+        store_id = None if not row else row["store_id"]
+        if store_id is not None and self._user_cache is not None:
+            await self._user_cache.set_store_id(user_id, store_id)
+        return store_id
 
     async def add_sku_to_user(self, user_id: int, sku_id: str) -> None:
         """
         Добавление товара к пользователю
         """
-        await self.conn.execute("INSERT INTO user_skus (user_id, sku_id) VALUES ($1, $2) ON CONFLICT DO NOTHING",
-                                user_id, sku_id)
+        conn = await self._get_conn()
+        await conn.execute("INSERT INTO user_skus (user_id, sku_id) VALUES ($1, $2) ON CONFLICT DO NOTHING",
+                           user_id, sku_id)
+        if self._user_cache is not None:
+            await self._user_cache.update_sku_ids(user_id, added=[sku_id])
+
+    async def add_skus_to_user(self, user_id: int, sku_ids: list[str]) -> None:
+        """Добавление нескольких товаров к пользователю одним запросом"""
+        conn = await self._get_conn()
+        await conn.execute(
+            "INSERT INTO user_skus (user_id, sku_id) SELECT $1, unnest($2::varchar[]) ON CONFLICT DO NOTHING",
+            user_id, sku_ids
+        )
+        if self._user_cache is not None:
+            await self._user_cache.update_sku_ids(user_id, added=sku_ids)
+
+    async def import_user_skus(self, user_skus: Iterable[tuple[int, str]]) -> None:
+        """
+        Импорт товаров пользователей
+        :param user_skus: Кортежи (user_id, sku_id)
+        """
+        user_skus = list(user_skus)
+        await self._bulk_upsert("user_skus", ("user_id", "sku_id"), ("user_id", "sku_id"), user_skus, "DO NOTHING")
+        if self._user_cache is not None:
+            for user_id in {user_id for user_id, _ in user_skus}:
+                await self._user_cache.invalidate_sku_ids(user_id)
 
     async def delete_user_sku(self, user_id: int, sku_id: str) -> None:
         """Удаление товара пользователя"""
-        await self.conn.execute("DELETE FROM user_skus WHERE user_id = $1 AND sku_id = $2",
-                                user_id, sku_id)
+        conn = await self._get_conn()
+        await conn.execute("DELETE FROM user_skus WHERE user_id = $1 AND sku_id = $2",
+                           user_id, sku_id)
+        if self._user_cache is not None:
+            await self._user_cache.update_sku_ids(user_id, removed=[sku_id])
 
     async def get_user_sku_ids(self, user_id: int) -> list[str]:
         """Получение идентификаторов товаров"""
-        rows = await self.conn.fetch(
+        if self._user_cache is not None:
+            sku_ids = await self._user_cache.get_sku_ids(user_id)
+            if sku_ids is not None:
+                return sku_ids
+
+        conn = await self._get_conn()
+        rows = await conn.fetch(
             "SELECT sku_id FROM user_skus WHERE user_id=$1",
             user_id
         )
+        sku_ids = [row["sku_id"] for row in rows]
+        if self._user_cache is not None:
+            await self._user_cache.set_sku_ids(user_id, sku_ids)
+        return sku_ids
 
-        return [row["sku_id"] for row in rows]
+    async def has_user_sku(self, user_id: int, sku_id: str) -> bool:
+        """Проверка, что пользователь отслеживает товар"""
+        if self._user_cache is not None:
+            sku_ids = await self._user_cache.get_sku_ids(user_id)
+            if sku_ids is not None:
+                return sku_id in sku_ids
 
-    async def get_store_skus(self) -> list[asyncpg.Record]:
-        """Получение информации о всех товарах в бд"""
-        rows = await self.conn.fetch(
-            "SELECT DISTINCT st.store_id AS store_id, sk.sku_id AS sku_id"
-            " FROM users AS u "
-            "JOIN user_store AS st on u.id = st.user_id "
-            "JOIN user_skus AS sk on u.id = sk.user_id "
+        conn = await self._get_conn()
+        return await conn.fetchval(
+            "SELECT EXISTS (SELECT 1 FROM user_skus WHERE user_id = $1 AND sku_id = $2)",
+            user_id, sku_id
         )
-        logging.info(rows)
-        return rows
 
-    async def get_user_store_skus(self) -> list[asyncpg.Record]:
-        """Получение информации о магазине и товарах пользователей"""
-        rows = await self.conn.fetch(
-            "SELECT u.id AS user_id, st.store_id AS store_id, sk.sku_id AS sku_id "
-            "FROM users AS u "
-            "JOIN user_store AS st on u.id = st.user_id "
-            "JOIN user_skus AS sk on u.id = sk.user_id"
+    async def iter_store_user_skus(self, store_id: str, prefetch: int = 1000) -> AsyncIterator[asyncpg.Record]:
+        """
+        Получение товаров пользователей магазина серверным курсором
+        :param store_id: Идентификатор магазина
+        :param prefetch: Кол-во строк, получаемых за один раз
+        """
+        conn = await self._get_conn()
+        async with conn.transaction(readonly=True):
+            async for row in conn.cursor(
+                    "SELECT st.user_id AS user_id, sk.sku_id AS sku_id "
+                    "FROM user_store AS st "
+                    "JOIN user_skus AS sk on st.user_id = sk.user_id "
+                    "WHERE st.store_id = $1 "
+                    "ORDER BY st.user_id",
+                    store_id,
+                    prefetch=prefetch,
+            ):
+                yield row
+
+    async def create_job_partitions(self, run_date: datetime.date) -> None:
+        """
+        Создание частей ночной рассылки по магазинам пользователей
+        Повторный вызов для той же даты не изменяет уже созданные части
+        """
+        conn = await self._get_conn()
+        await conn.execute(
+            "INSERT INTO discount_job_partitions (run_date, store_id) "
+            "SELECT DISTINCT $1::date, st.store_id "
+            "FROM user_store AS st "
+            "JOIN user_skus AS sk on st.user_id = sk.user_id "
+            "ON CONFLICT DO NOTHING",
+            run_date
         )
 
-        return rows
+    async def claim_job_partition(self, run_date: datetime.date, lease_owner: str,
+                                  lease_seconds: int, max_attempts: int) -> Optional[asyncpg.Record]:
+        """
+        Захват свободной части рассылки или части с истёкшей арендой
+        :return: Идентификатор магазина и номер попытки захваченной части
+        """
+        conn = await self._get_conn()
+        return await conn.fetchrow(
+            "UPDATE discount_job_partitions SET status = 'running', lease_owner = $2, "
+            "lease_expires_at = now() + $3 * interval '1 second', attempts = attempts + 1, updated_at = now() "
+            "WHERE (run_date, store_id) = ("
+            " SELECT run_date, store_id FROM discount_job_partitions "
+            " WHERE run_date = $1 AND attempts < $4 "
+            " AND (status = 'pending' OR (status = 'running' AND lease_expires_at < now())) "
+            " ORDER BY store_id LIMIT 1 FOR UPDATE SKIP LOCKED"
+            ") RETURNING store_id, attempts",
+            run_date, lease_owner, lease_seconds, max_attempts
+        )
+
+    async def extend_job_partition_lease(self, run_date: datetime.date, store_id: str,
+                                         lease_owner: str, lease_seconds: int) -> bool:
+        """
+        Продление аренды части рассылки
+        :return: Аренда всё ещё принадлежит обработчику
+        """
+        conn = await self._get_conn()
+        result = await conn.execute(
+            "UPDATE discount_job_partitions SET lease_expires_at = now() + $4 * interval '1 second', "
+            "updated_at = now() "
+            "WHERE run_date = $1 AND store_id = $2 AND lease_owner = $3 AND status = 'running'",
+            run_date, store_id, lease_owner, lease_seconds
+        )
+        return result != "UPDATE 0"
+
+    async def finish_job_partition(self, run_date: datetime.date, store_id: str,
+                                   lease_owner: str, status: str) -> None:
+        """Сохранение результата обработки части рассылки"""
+        conn = await self._get_conn()
+        await conn.execute(
+            "UPDATE discount_job_partitions SET status = $4, lease_owner = NULL, lease_expires_at = NULL, "
+            "updated_at = now() "
+            "WHERE run_date = $1 AND store_id = $2 AND lease_owner = $3",
+            run_date, store_id, lease_owner, status
+        )
+
+    async def release_job_partitions(self, lease_owners: list[str]) -> int:
+        """
+        Возврат в очередь частей с указанными владельцами аренды
+        Прерванная остановкой бота попытка не учитывается
+        :param lease_owners: Владельцы аренды
+        :return: Кол-во возвращённых частей
+        """
+        conn = await self._get_conn()
+        result = await conn.execute(
+            "UPDATE discount_job_partitions SET status = 'pending', lease_owner = NULL, lease_expires_at = NULL, "
+            "attempts = greatest(attempts - 1, 0), updated_at = now() "
+            "WHERE status = 'running' AND lease_owner = ANY($1::varchar[])",
+            lease_owners
+        )
+        return int(result.split()[-1])
+
+    async def fail_exhausted_job_partitions(self, run_date: datetime.date, max_attempts: int) -> list[str]:
+        """
+        Завершение частей рассылки с истёкшей арендой и исчерпанными попытками
+        Такие части больше не захватываются, поэтому иначе остались бы в статусе running
+        :return: Идентификаторы магазинов завершённых частей
+        """
+        conn = await self._get_conn()
+        rows = await conn.fetch(
+            "UPDATE discount_job_partitions SET status = 'failed', lease_owner = NULL, lease_expires_at = NULL, "
+            "updated_at = now() "
+            "WHERE run_date = $1 AND status = 'running' AND attempts >= $2 AND lease_expires_at < now() "
+            "RETURNING store_id",
+            run_date, max_attempts
+        )
+        return [row["store_id"] for row in rows]
+
+    async def has_active_job_partitions(self, run_date: datetime.date, max_attempts: int) -> bool:
+        """
+        Проверка наличия частей рассылки, которые ещё будут обработаны
+        Части с исчерпанными попытками и истёкшей арендой не учитываются
+        """
+        conn = await self._get_conn()
+        return await conn.fetchval(
+            "SELECT EXISTS("
+            " SELECT 1 FROM discount_job_partitions "
+            " WHERE run_date = $1 AND status IN ('pending', 'running') "
+            " AND (attempts < $2 OR lease_expires_at >= now())"
+            ")",
+            run_date, max_attempts
+        )
+
+    async def get_unfinished_job_dates(self, since: datetime.date) -> list[datetime.date]:
+        """Получение дат рассылок с необработанными частями"""
+        conn = await self._get_conn()
+        rows = await conn.fetch(
+            "SELECT DISTINCT run_date FROM discount_job_partitions "
+            "WHERE run_date >= $1 AND status IN ('pending', 'running') ORDER BY run_date",
+            since
+        )
+        return [row["run_date"] for row in rows]
+
+    async def get_delivered_user_ids(self, run_date: datetime.date, user_ids: list[int]) -> set[int]:
+        """Получение пользователей, которым уже отправлено уведомление"""
+        conn = await self._get_conn()
+        rows = await conn.fetch(
+            "SELECT user_id FROM discount_job_deliveries "
+            "WHERE run_date = $1 AND user_id = ANY($2::bigint[]) AND status IN ('delivered', 'blocked')",
+            run_date, user_ids
+        )
+        return {row["user_id"] for row in rows}
+
+    async def add_job_deliveries(self, run_date: datetime.date, deliveries: Iterable[tuple[int, str]]) -> None:
+        """Сохранение результатов отправки уведомлений"""
+        await self._bulk_upsert(
+            "discount_job_deliveries", ("run_date", "user_id", "status"), ("run_date", "user_id"),
+            ((run_date, user_id, status) for user_id, status in deliveries),
+            "DO UPDATE SET status = EXCLUDED.status, created_at = now()",
+        )
+
+    async def get_sku_snapshots(self, store_id: str, sku_ids: list[str]) -> dict[str, asyncpg.Record]:
+        """Получение сохранённых состояний скидок на товары магазина"""
+        conn = await self._get_conn()
+        rows = await conn.fetch(
+            "SELECT sku_id, promo_id, regular_price, discount_price, validity_end_date FROM store_sku_snapshots "
+            "WHERE store_id = $1 AND sku_id = ANY($2::varchar[])",
+            store_id, sku_ids
+        )
+        return {row["sku_id"]: row for row in rows}
+
+    async def save_sku_snapshots(self, store_id: str, skus: Iterable[BaseSku]) -> None:
+        """Сохранение текущих состояний скидок на товары магазина"""
+        await self._bulk_upsert(
+            "store_sku_snapshots",
+            ("store_id", "sku_id", "promo_id", "regular_price", "discount_price", "validity_end_date"),
+            ("store_id", "sku_id"),
+            (
+                (
+                    store_id,
+                    sku.code,
+                    sku.promo_id if sku.promo_type != "None" else None,
+                    sku.regular_price,
+                    sku.discount_price,
+                    sku.validity_end_date.date() if sku.validity_end_date else None,
+                )
+                for sku in skus
+            ),
+            "DO UPDATE SET promo_id = EXCLUDED.promo_id, "
+            "regular_price = EXCLUDED.regular_price, discount_price = EXCLUDED.discount_price, "
+            "validity_end_date = EXCLUDED.validity_end_date, updated_at = now()",
+        )
+
+    async def add_price_observations(self, observations: Iterable[tuple]) -> None:
+        """
+        Добавление наблюдений цен товаров через COPY
+        :param observations: Кортежи (store_id, sku_id, observed_at, regular_price, discount_price, promo_id)
+        """
+        conn = await self._get_conn()
+        await conn.copy_records_to_table(
+            "sku_price_history",
+            records=observations,
+            columns=("store_id", "sku_id", "observed_at", "regular_price", "discount_price", "promo_id"),
+        )
+
+    async def get_lowest_price(self, store_id: str, sku_id: str, days: int) -> Optional[asyncpg.Record]:
+        """
+        Получение минимальной цены товара за период
+        :param store_id: Идентификатор магазина
+        :param sku_id: Идентификатор товара
+        :param days: Кол-во последних дней
+        :return: Запись с ценой и временем наблюдения
+        """
+        conn = await self._get_conn()
+        return await conn.fetchrow(
+            "SELECT COALESCE(discount_price, regular_price) AS price, observed_at FROM sku_price_history "
+            "WHERE store_id = $1 AND sku_id = $2 AND observed_at >= now() - make_interval(days => $3) "
+            "ORDER BY price, observed_at DESC LIMIT 1",
+            store_id, sku_id, days
+        )
+
+    async def get_price_trend(self, store_id: str, sku_id: str, days: int) -> list[asyncpg.Record]:
+        """
+        Получение изменения цены товара по дням
+        :param store_id: Идентификатор магазина
+        :param sku_id: Идентификатор товара
+        :param days: Кол-во последних дней
+        :return: Записи с днём, минимальной и максимальной ценой за день
+        """
+        conn = await self._get_conn()
+        return await conn.fetch(
+            "SELECT observed_at::date AS day, "
+            "MIN(COALESCE(discount_price, regular_price)) AS min_price, "
+            "MAX(COALESCE(discount_price, regular_price)) AS max_price "
+            "FROM sku_price_history "
+            "WHERE store_id = $1 AND sku_id = $2 AND observed_at >= now() - make_interval(days => $3) "
+            "GROUP BY day ORDER BY day",
+            store_id, sku_id, days
+        )
@@ -1,3 +1,5 @@
+from typing import Sequence
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
 from lenta.client import LentaClient
@@ -10,33 +12,26 @@ async def search_sku_in_store(store_id: str, sku_name: str, lenta_client: LentaC
     return await lenta_client.search_skus_in_store(store_id, sku_name)
 
 
-async def get_catalog_groups(lenta_client: LentaClient, store_id: str) -> list[DetailCategory]:
+async def get_catalog_groups(lenta_client: LentaClient, store_id: str) -> Sequence[DetailCategory]:
     """Получение корня каталога"""
-    catalog = await lenta_client.get_catalog(store_id)
-    return catalog.catalog_groups
+    catalog_index = await lenta_client.get_catalog_index(store_id)
+    return catalog_index.groups
 
 
 async def get_group_categories(lenta_client: LentaClient, store_id: str,
-                               group_category_code: str) -> list[DetailCategory]:
+                               group_category_code: str) -> Sequence[DetailCategory]:
     """Получение категорий группы"""
-    catalog = await lenta_client.get_catalog(store_id)
-    for group in catalog.catalog_groups:
-        if group.code == group_category_code:
-            return group.categories
-    return []
+    catalog_index = await lenta_client.get_catalog_index(store_id)
+    group = catalog_index.get_group(group_category_code)
+    return group.categories if group else []
 
 
 async def get_category_subcategories(lenta_client: LentaClient, store_id: str,
-                                     category_code: str) -> list[DetailCategory]:
+                                     category_code: str) -> Sequence[DetailCategory]:
     """Получение подкатегорий категории"""
-
-    # Пока сканируем все группы и категории
-    catalog = await lenta_client.get_catalog(store_id)
-    for group in catalog.catalog_groups:
-        for category in group.categories:
-            if category.code == category_code:
-                return category.subcategories
-    return []
+    catalog_index = await lenta_client.get_catalog_index(store_id)
+    category = catalog_index.get_category(category_code)
+    return category.subcategories if category else []
 
 
 async def get_category_skus(lenta_client: LentaClient, store_id: str, category_code: str) -> list[BaseSku]:
@@ -45,7 +40,7 @@ async def get_category_skus(lenta_client: LentaClient, store_id: str, category_c
     return skus
 
 
-def get_inline_keyboard_for_groups(groups: list[DetailCategory]) -> InlineKeyboardMarkup:
+def get_inline_keyboard_for_groups(groups: Sequence[DetailCategory]) -> InlineKeyboardMarkup:
     """Получение клавиатура для выбора группы"""
     keyboard = InlineKeyboardMarkup(row_width=2)
     for group in groups:
@@ -56,7 +51,7 @@ def get_inline_keyboard_for_groups(groups: list[DetailCategory]) -> InlineKeyboa
     return keyboard
 
 
-def get_inline_keyboard_for_categories(categories: list[DetailCategory]) -> InlineKeyboardMarkup:
+def get_inline_keyboard_for_categories(categories: Sequence[DetailCategory]) -> InlineKeyboardMarkup:
     """Получение клавиатуры для выбора категорий"""
     keyboard = InlineKeyboardMarkup(row_width=2)
     for category in categories:
@@ -67,7 +62,7 @@ def get_inline_keyboard_for_categories(categories: list[DetailCategory]) -> Inli
     return keyboard
 
 
-def get_inline_keyboard_for_subcategories(subcategories: list[DetailCategory]) -> InlineKeyboardMarkup:
+def get_inline_keyboard_for_subcategories(subcategories: Sequence[DetailCategory]) -> InlineKeyboardMarkup:
     """Получение клавиатуры для выбора подкатегорий"""
     keyboard = InlineKeyboardMarkup(row_width=2)
 
@@ -5,7 +5,6 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from lenta.client import LentaClient
 from lenta.models import Store, City
 from tgbot.callbacks.profile import city_cb, store_cb
-from tgbot.services.utils import distance_between_points
 
 
 async def get_city_by_name(city_name: str, lenta_client: LentaClient) -> Optional[City]:
@@ -54,9 +53,6 @@ async def get_inline_keyboard_for_city_stores(lenta_client: LentaClient, city_id
 
 async def get_store_by_coodrinites(lenta_client: LentaClient, latitude: float, longitude: float) -> Store:
     """Поиск ближайшего магазина Ленты"""
-    cities = await lenta_client.get_cities()
-    cities = sorted(cities, key=lambda c: distance_between_points(latitude, longitude, c.lat, c.long))
-    nearest_city = cities[0]
-    city_stores = await lenta_client.get_city_stores(nearest_city.id)
-    stores = sorted(city_stores, key=lambda s: distance_between_points(latitude, longitude, s.lat, s.long))
-    return stores[0]
+    store_index = await lenta_client.get_store_index()
+    store, _ = store_index.nearest(latitude, longitude)[0]
+    return store
@@ -0,0 +1,72 @@
+from typing import Iterable, Optional
+
+from lenta.cache.base import BaseCache
+from lenta.consts import HOUR
+
+
+class UserCache:
+    """
+    Кэш данных пользователей, которые читаются почти в каждом обработчике
+    Значения обновляются репозиторием при изменении данных пользователя
+    """
+
+    def __init__(self, cache: BaseCache, ttl: int = HOUR):
+        """
+        :param cache: Хранилище кэша
+        :param ttl: Время жизни записи в секундах
+        """
+        self._cache = cache
+        self._ttl = ttl
+
+    @property
+    def cache(self) -> BaseCache:
+        return self._cache
+
+    @staticmethod
+    def _store_id_key(user_id: int) -> str:
+        return f"user:{user_id}:store_id"
+
+    async def get_store_id(self, user_id: int) -> Optional[str]:
+        """Получение идентификатора магазина пользователя"""
+        return await self._cache.get(self._store_id_key(user_id))
+
+    async def set_store_id(self, user_id: int, store_id: str) -> None:
+        """Сохранение идентификатора магазина пользователя"""
+        await self._cache.set(self._store_id_key(user_id), store_id, self._ttl)
+
+    async def invalidate_store_id(self, user_id: int) -> None:
+        """Удаление идентификатора магазина пользователя"""
+        await self._cache.delete(self._store_id_key(user_id))
+
+    @staticmethod
+    def _sku_ids_key(user_id: int) -> str:
+        return f"user:{user_id}:sku_ids"
+
+    async def get_sku_ids(self, user_id: int) -> Optional[list[str]]:
+        """Получение идентификаторов отслеживаемых товаров пользователя в порядке их добавления"""
+        sku_ids = await self._cache.get(self._sku_ids_key(user_id))
+        # Кэш в памяти отдаёт сохранённый объект, поэтому возвращаем копию
+        return list(sku_ids) if sku_ids is not None else None
+
+    async def set_sku_ids(self, user_id: int, sku_ids: Iterable[str]) -> None:
+        """Сохранение идентификаторов отслеживаемых товаров пользователя с сохранением порядка"""
+        await self._cache.set(self._sku_ids_key(user_id), list(dict.fromkeys(sku_ids)), self._ttl)
+
+    async def update_sku_ids(self, user_id: int, added: Iterable[str] = (), removed: Iterable[str] = ()) -> None:
+        """
+        Изменение сохранённых товаров пользователя, если они есть в кэше
+        Добавленные товары попадают в конец списка, как и в выборке из БД
+        :param user_id: Идентификатор пользователя
+        :param added: Добавленные товары
+        :param removed: Удалённые товары
+        """
+        sku_ids = await self.get_sku_ids(user_id)
+        if sku_ids is None:
+            return
+        removed = set(removed)
+        sku_ids = [sku_id for sku_id in [*sku_ids, *added] if sku_id not in removed]
+        await self.set_sku_ids(user_id, sku_ids)
+
+    async def invalidate_sku_ids(self, user_id: int) -> None:
+        """Удаление идентификаторов товаров пользователя"""
+        await self._cache.delete(self._sku_ids_key(user_id))